@@ -0,0 +1,91 @@
+"""Compare encode time and output size of the build profiles.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_compression [--sizes 1000,10000] [--font icons.ttf] [--runs 3]
+
+Every profile encodes each sample font to WOFF and WOFF2 with its own
+settings, whether or not it writes that format by default. The sample fonts
+are generated icon fonts with TrueType and CFF outlines, plus any --font.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import build_font
+from ui.fontencoder import zopfli_compress
+from ui.processor import FontProcessor
+from ui.profiles import PROFILES
+
+FORMATS = ['woff', 'woff2']
+
+
+def load_samples(sizes, fonts):
+    """Yield the name and the compiled sfnt binary of every sample font."""
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            for cff in (False, True):
+                name = '{}-{}'.format('cff' if cff else 'tt', size)
+                filename = os.path.join(directory, name)
+                build_font(filename, size, cff)
+                yield name, FontProcessor.compile_font(TTFont(filename))
+
+    for filename in fonts:
+        yield os.path.basename(filename), FontProcessor.compile_font(TTFont(filename))
+
+
+def measure(data, extension, profile, runs):
+    """Median seconds to encode data, and the encoded size."""
+    timings = []
+
+    for _ in range(runs):
+        started = time.perf_counter()
+        encoded = FontProcessor.encode_font(data, extension, profile)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(encoded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the compression of the ligafont build profiles.')
+    parser.add_argument('--sizes', default='1000,10000',
+                        help='comma separated glyph counts of the generated fonts (default: %(default)s)')
+    parser.add_argument('--font', action='append', default=[], help='also measure this font, may be repeated')
+    parser.add_argument('--runs', type=int, default=3, help='encodes of each font and format (default: %(default)s)')
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    if not zopfli_compress:
+        print('zopfli is not installed, the release profile compresses WOFF with zlib')
+
+    results = []
+    print('{:<28} {:<6} {:<8} {:>9} {:>10} {:>7}'.format('font', 'format', 'profile', 'time', 'bytes', 'ratio'))
+
+    for name, data in load_samples(sizes, args.font):
+        for extension in FORMATS:
+            for profile in sorted(PROFILES):
+                timing, size = measure(data, extension, PROFILES[profile], args.runs)
+                results.append({
+                    'font': name,
+                    'format': extension,
+                    'profile': profile,
+                    'time': timing,
+                    'bytes': size,
+                    'sfnt_bytes': len(data),
+                })
+                print('{:<28} {:<6} {:<8} {:>8.3f}s {:>10} {:>6.1%}'.format(
+                    name, extension, profile, timing, size, size / len(data)
+                ))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Time rendering the preview of a font, in one process, in a process pool
+and from the render cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_preview [--glyphs 10000] [--cff] [--runs 3]
+
+Every glyph but .notdef gets a ligature. The sprite sheets of the three ways
+have to be the same.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import build_font, build_mapping
+from ui.preview import PreviewRenderer
+from ui.processor import FontProcessor
+
+
+def render(font_data, mapping, workers=1, cache=None):
+    """Seconds to render and lay out the whole preview, and the renderer."""
+    started = time.perf_counter()
+
+    renderer = PreviewRenderer(font_data, mapping, workers)
+    renderer.render(cache)
+    pages = list(renderer.create_pages())
+    b''.join(renderer.create_html('bench', 'bench.ttf'))
+    renderer.create_index('bench')
+
+    return time.perf_counter() - started, renderer, pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time rendering the ligafont preview.')
+    parser.add_argument('--glyphs', type=int, default=10000, help='glyphs in the font (default: %(default)s)')
+    parser.add_argument('--cff', action='store_true', help='use CFF instead of TrueType outlines')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes of the pool (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=3, help='runs of each way (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        font_file = os.path.join(directory, 'bench.otf' if args.cff else 'bench.ttf')
+        build_font(font_file, args.glyphs, args.cff)
+        with open(font_file, 'rb') as file:
+            font_data = FontProcessor.compile_font(TTFont(BytesIO(file.read())))
+
+    mapping = build_mapping(args.glyphs - 1, 4)
+    print('{} glyphs, {} outlines, {} worker processes'.format(
+        args.glyphs, 'CFF' if args.cff else 'TrueType', args.workers
+    ))
+
+    expected = None
+    cache = None
+    for name, workers, cached in [('one process', 1, False), ('process pool', args.workers, False),
+                                  ('cached', 1, True)]:
+        timings = []
+        for _ in range(args.runs):
+            timing, renderer, pages = render(font_data, mapping, workers, cache if cached else None)
+            timings.append(timing)
+
+            if expected is None:
+                expected = pages
+                cache = renderer.cache
+            elif pages != expected:
+                raise AssertionError('{}: the sprite sheets differ'.format(name))
+
+        print('{:<13} median {:.3f}s, min {:.3f}s, {} glyphs rendered'.format(
+            name, statistics.median(timings), min(timings), renderer.rendered
+        ))
+
+
+if __name__ == '__main__':
+    main()
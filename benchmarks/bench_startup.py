@@ -0,0 +1,103 @@
+"""Time the start of the GUI, from launching Python to the shown window.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup [--runs 10] [--compile-ui]
+
+Every run starts a fresh interpreter that sets up the main window like
+main.py does and reports when it is shown, so the numbers include the
+interpreter start and every import. --compile-ui makes each run compile the
+.ui files, the way every start used to, in a copy of the ui package.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# mirrors main.py, without entering the event loop
+CHILD = '''
+import sys
+import time
+
+started = time.perf_counter()
+
+from PyQt5.QtWidgets import QApplication, QMainWindow
+
+from ui.controller import MainUIController
+
+imported = time.perf_counter()
+
+app = QApplication(sys.argv)
+window = QMainWindow()
+controller = MainUIController(window, app)
+window.show()
+app.processEvents()
+
+print('shown', imported - started, flush=True)
+'''
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_once(directory, compile_ui=False):
+    """Seconds until the window was shown in directory, and the part spent
+    importing.
+    """
+    if compile_ui:
+        # an outdated .py file without a recorded hash forces a compile
+        py_file = os.path.join(directory, 'ui', 'views', 'mainwindow.py')
+        with open(py_file, 'w') as file:
+            file.write('')
+        os.utime(py_file, (0, 0))
+
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    started = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, '-c', CHILD], cwd=directory, env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+    )
+    for line in child.stdout:
+        if line.startswith('shown'):
+            shown = time.perf_counter() - started
+            imported = float(line.split()[1])
+            break
+    else:
+        raise RuntimeError('the window was not shown')
+
+    child.stdout.close()
+    child.wait()
+    return shown, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the start of the ligafont GUI.')
+    parser.add_argument('--runs', type=int, default=10, help='number of starts (default: %(default)s)')
+    parser.add_argument('--compile-ui', action='store_true', help='compile the .ui files on every start')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.compile_ui:
+            # the compiled views of the checkout are left alone
+            shutil.copytree(os.path.join(ROOT, 'ui'), os.path.join(directory, 'ui'),
+                            ignore=shutil.ignore_patterns('__pycache__'))
+        else:
+            directory = ROOT
+
+        # the first start warms the disk cache and compiles the bytecode
+        start_once(directory, args.compile_ui)
+        timings = [start_once(directory, args.compile_ui) for _ in range(args.runs)]
+
+    shown = [timing[0] for timing in timings]
+    imported = [timing[1] for timing in timings]
+    print('window shown: median {:.3f}s, min {:.3f}s'.format(statistics.median(shown), min(shown)))
+    print('imports:      median {:.3f}s, min {:.3f}s'.format(statistics.median(imported), min(imported)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Time filling LigatureTableModel with glyph sets of growing size.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_table_model [--per-row] [--memory] [--search]
+
+--per-row fills the model through add() one glyph at a time instead of
+set_names(), for comparison. --memory reports the memory the filled model
+holds, measured with tracemalloc, instead of the load time. --search reports
+the time the filter box takes per query once its indexes are built.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication, QTableView
+
+from ui.ligatureitem import LigatureItem
+from ui.ligaturetablemodel import LigatureTableModel
+
+SIZES = [1000, 10000, 60000]
+
+SEARCH_QUERIES = ['i', 'ic', 'icon', 'icon12', 'icno1', 'is:unassigned', 'is:conflict']
+
+
+def bench_load(app, count, per_row=False):
+    view = QTableView()
+    model = LigatureTableModel([], ['Name', 'Ligature'], view)
+    view.setModel(model)
+    view.setSortingEnabled(True)
+    view.show()
+    app.processEvents()
+
+    names = ['icon{}'.format(index) for index in range(count)]
+
+    started = time.perf_counter()
+    model.clear()
+    if per_row:
+        for name in names:
+            model.add(LigatureItem(name, ''))
+    else:
+        model.set_names(names)
+    model.restore_mapping()
+    app.processEvents()
+    elapsed = time.perf_counter() - started
+
+    view.close()
+    return elapsed
+
+
+def bench_memory(count, per_row=False):
+    """Bytes allocated by a model holding count glyphs, names included."""
+    model = LigatureTableModel([], ['Name', 'Ligature'])
+
+    tracemalloc.start()
+    names = ['icon{}'.format(index) for index in range(count)]
+    if per_row:
+        for name in names:
+            model.add(LigatureItem(name, ''))
+    else:
+        model.set_names(names)
+    del names
+
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def bench_search(app, count):
+    """Slowest search box query, in seconds."""
+    view = QTableView()
+    model = LigatureTableModel([], ['Name', 'Ligature'], view)
+    view.setModel(model)
+    view.show()
+
+    model.set_names(['icon{}'.format(index) for index in range(count)])
+    for row in range(0, count, 10):
+        model.ligatures[row] = 'lig{}'.format(row)
+    model.set_filter('build')
+    app.processEvents()
+
+    slowest = 0
+    for query in SEARCH_QUERIES:
+        started = time.perf_counter()
+        model.set_filter(query)
+        app.processEvents()
+        slowest = max(slowest, time.perf_counter() - started)
+
+    view.close()
+    return slowest
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    per_row = '--per-row' in argv
+
+    app = QApplication(sys.argv[:1])
+    for count in SIZES:
+        if '--search' in argv:
+            print('{:>6} glyphs: {:.1f}ms per query'.format(count, bench_search(app, count) * 1000))
+        elif '--memory' in argv:
+            size = bench_memory(count, per_row)
+            print('{:>6} glyphs: {:.1f} KiB ({:.0f} bytes/glyph)'.format(count, size / 1024, size / count))
+        else:
+            print('{:>6} glyphs: {:.3f}s'.format(count, bench_load(app, count, per_row)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Synthetic icon fonts and ligature mappings for the benchmarks."""
+import string
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import newTable
+from fontTools.ttLib.tables import otTables
+
+PUA_START = 0xE000
+PUA_SIZE = 0x1900
+
+
+def glyph_names(count):
+    return ['.notdef'] + ['icon{}'.format(index) for index in range(count - 1)]
+
+
+def draw_icon(pen, index):
+    """A square with a notch, sized by index so outlines differ."""
+    size = 100 + index % 700
+    pen.moveTo((50, 0))
+    pen.lineTo((50 + size, 0))
+    pen.lineTo((50 + size, size))
+    pen.lineTo((50 + size // 2, size // 2))
+    pen.lineTo((50, size))
+    pen.closePath()
+
+
+def build_font(filename, count, cff=False):
+    """Write an icon font with count glyphs, the icons mapped to the Private
+    Use Area as far as it reaches.
+    """
+    names = glyph_names(count)
+
+    builder = FontBuilder(1000, isTTF=not cff)
+    builder.setupGlyphOrder(names)
+    builder.setupCharacterMap(dict(
+        (PUA_START + index, name) for index, name in enumerate(names[1:PUA_SIZE + 1])
+    ))
+
+    if cff:
+        char_strings = {}
+        for index, name in enumerate(names):
+            pen = T2CharStringPen(1000, None)
+            draw_icon(pen, index)
+            char_strings[name] = pen.getCharString()
+        builder.setupCFF('LigafontBench', {'FullName': 'Ligafont Bench'}, char_strings, {})
+    else:
+        glyphs = {}
+        for index, name in enumerate(names):
+            pen = TTGlyphPen(None)
+            draw_icon(pen, index)
+            glyphs[name] = pen.glyph()
+        builder.setupGlyf(glyphs)
+
+    builder.setupHorizontalMetrics(dict((name, (1000, 50)) for name in names))
+    builder.setupHorizontalHeader(ascent=900, descent=-100)
+    builder.setupNameTable({'familyName': 'Ligafont Bench', 'styleName': 'Regular'})
+    builder.setupOS2()
+    builder.setupPost()
+    builder.font['GDEF'] = build_gdef(names)
+
+    builder.save(filename)
+
+
+def build_gdef(names):
+    """The GDEF table icon font generators write, which the XML engine expects."""
+    gdef = newTable('GDEF')
+    table = gdef.table = otTables.GDEF()
+    table.Version = 0x00010000
+    table.AttachList = None
+    table.MarkAttachClassDef = None
+
+    table.GlyphClassDef = otTables.GlyphClassDef()
+    table.GlyphClassDef.classDefs = dict((name, 1) for name in names[1:])
+
+    table.LigCaretList = otTables.LigCaretList()
+    table.LigCaretList.Coverage = otTables.Coverage()
+    table.LigCaretList.Coverage.glyphs = []
+    table.LigCaretList.LigGlyphCount = 0
+    table.LigCaretList.LigGlyph = []
+    return gdef
+
+
+def ligature_name(index, length):
+    """The index-th lower case word of the given length.
+
+    The first letter changes fastest, which spreads the ligatures evenly over
+    the ligature sets of their first glyph like real icon names.
+    """
+    letters = []
+    for _ in range(length):
+        index, letter = divmod(index, len(string.ascii_lowercase))
+        letters.append(string.ascii_lowercase[letter])
+    return ''.join(letters)
+
+
+def build_mapping(count, length):
+    """Map count ligatures of at least length letters to the first icons."""
+    while len(string.ascii_lowercase) ** length < count:
+        length += 1
+
+    return dict(
+        (ligature_name(index, length), 'icon{}'.format(index)) for index in range(count)
+    )
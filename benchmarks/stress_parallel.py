@@ -0,0 +1,129 @@
+"""Run many builds at once in one process and check they do not interfere.
+
+Run from the repository root:
+
+    python -m benchmarks.stress_parallel [--builds 48] [--glyphs 1000]
+
+Every build uses its own TTFont and output directory. Each output has to
+match a build of the same engine run on its own, table by table, apart from
+the modification time in 'head'. Some builds get
+a broken mapping on purpose, and no workspace may be left behind, even by
+those.
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import build_font, build_mapping
+from ui.engines import ENGINES
+
+# every this many builds gets a mapping to a glyph the font does not have
+BROKEN_EVERY = 8
+
+
+def list_workspaces():
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), 'ligafont-*')))
+
+
+def get_tables(data):
+    """The binary tables of a font, with the fields of 'head' that change
+    with every build zeroed.
+    """
+    ttf = TTFont(BytesIO(data))
+    tables = dict((tag, ttf.reader[tag]) for tag in ttf.reader.keys())
+
+    head = bytearray(tables['head'])
+    head[8:12] = bytes(4)  # checkSumAdjustment
+    head[28:36] = bytes(8)  # modified
+    tables['head'] = bytes(head)
+    return tables
+
+
+def build(font_file, mapping, engine, output_dir):
+    os.makedirs(output_dir)
+
+    ttf = TTFont(font_file)
+    try:
+        processor = ENGINES[engine](ttf, mapping)
+        processor.save_files(output_dir, 'stress', ['ttf'])
+    finally:
+        ttf.close()
+
+    with open(os.path.join(output_dir, 'stress.ttf'), 'rb') as file:
+        return get_tables(file.read())
+
+
+def run(builds, glyphs, root):
+    font_file = os.path.join(root, 'stress.ttf')
+    build_font(font_file, glyphs)
+
+    mapping = build_mapping(glyphs - 1, 4)
+    broken_mapping = dict(mapping, broken='no_such_glyph')
+
+    engines = sorted(ENGINES)
+    expected = dict(
+        (engine, build(font_file, mapping, engine, os.path.join(root, 'expected', engine)))
+        for engine in engines
+    )
+
+    workspaces = list_workspaces()
+    failures = []
+
+    with ThreadPoolExecutor(max_workers=builds) as executor:
+        jobs = []
+        for index in range(builds):
+            engine = engines[index % len(engines)]
+            broken = index % BROKEN_EVERY == BROKEN_EVERY - 1
+            output_dir = os.path.join(root, 'build{}'.format(index))
+
+            job = executor.submit(build, font_file, broken_mapping if broken else mapping, engine, output_dir)
+            jobs.append((index, engine, broken, job))
+
+        for index, engine, broken, job in jobs:
+            try:
+                tables = job.result()
+            except Exception as e:
+                if not broken:
+                    failures.append('build {} ({}) failed: {}: {}'.format(index, engine, type(e).__name__, e))
+                continue
+
+            if broken:
+                failures.append('build {} ({}) accepted a broken mapping'.format(index, engine))
+            elif tables != expected[engine]:
+                failures.append('build {} ({}) differs from the serial build'.format(index, engine))
+
+    leftovers = list_workspaces() - workspaces
+    if leftovers:
+        failures.append('workspaces left behind: {}'.format(', '.join(sorted(leftovers))))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run many ligafont builds at once.')
+    parser.add_argument('--builds', type=int, default=48, help='concurrent builds (default: %(default)s)')
+    parser.add_argument('--glyphs', type=int, default=1000, help='glyphs of the test font (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix='ligafont-stress-')
+    started = time.perf_counter()
+    try:
+        failures = run(args.builds, args.glyphs, root)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    for failure in failures:
+        print(failure)
+    print('{} builds, {} problems, {:.3f}s'.format(args.builds, len(failures), time.perf_counter() - started))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Benchmark suite on synthetic icon fonts of growing size.
+
+Run from the repository root:
+
+    python -m benchmarks.suite [--sizes 100,1000] [--output results.json]
+                               [--baseline baseline.json] [--threshold 0.25]
+
+Builds TrueType and CFF fonts with 100 to 60k glyphs and ligature mappings
+that grow with them, then times loading, processing and saving with each
+engine and filling LigatureTableModel. Every timing is the best of --repeat
+runs. The results are written as JSON; given a baseline from an earlier run,
+the suite fails when a benchmark got slower by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import fontTools
+from PyQt5.QtWidgets import QApplication
+
+from benchmarks.bench_table_model import bench_load
+from benchmarks.fontgen import build_font, build_mapping
+from ui.engines import ENGINES
+from ui.processor import load_font
+
+SIZES = [100, 1000, 10000, 60000]
+FLAVORS = ['tt', 'cff']
+
+# slowdowns below this many seconds are noise, whatever the ratio
+MIN_REGRESSION = 0.005
+
+
+def get_font(workdir, count, flavor):
+    """Generated fonts are kept in workdir and reused by later runs."""
+    filename = os.path.join(workdir, '{}-{}.{}'.format(flavor, count, 'otf' if flavor == 'cff' else 'ttf'))
+    if not os.path.exists(filename):
+        build_font(filename, count, cff=flavor == 'cff')
+    return filename
+
+
+def get_mapping(count):
+    # one ligature per icon, longer ligatures for larger fonts
+    return build_mapping(count - 1, len(str(count)))
+
+
+def best_of(repeat, func):
+    timings = None
+    for _ in range(repeat):
+        current = func()
+        timings = current if timings is None else dict(
+            (name, min(value, current[name])) for name, value in timings.items()
+        )
+    return timings
+
+
+def bench_build(filename, mapping, engine, output_dir):
+    timings = {}
+
+    started = time.perf_counter()
+    ttf = load_font(filename)
+    timings['load'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    processor = ENGINES[engine](ttf, mapping)
+    timings['process'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    processor.save_files(output_dir, 'bench')
+    timings['save'] = time.perf_counter() - started
+
+    ttf.close()
+    return timings
+
+
+def run(sizes, engines, repeat, workdir):
+    results = {}
+    app = QApplication(sys.argv[:1])
+
+    output_dir = tempfile.mkdtemp(prefix='ligafont-bench-')
+    try:
+        for count in sizes:
+            mapping = get_mapping(count)
+
+            for flavor in FLAVORS:
+                filename = get_font(workdir, count, flavor)
+
+                for engine in engines:
+                    timings = best_of(repeat, lambda: bench_build(filename, mapping, engine, output_dir))
+                    for stage, value in timings.items():
+                        name = '{}/{}/{}/{}'.format(flavor, engine, count, stage)
+                        results[name] = value
+                        print('{:<32} {:.4f}s'.format(name, value))
+
+            name = 'table_model/{}/load'.format(count)
+            results[name] = best_of(repeat, lambda: {'load': bench_load(app, count)})['load']
+            print('{:<32} {:.4f}s'.format(name, results[name]))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Names of the benchmarks that got slower than the baseline allows."""
+    regressions = []
+
+    for name, value in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        if value > previous * (1 + threshold) and value - previous > MIN_REGRESSION:
+            print('REGRESSION {:<32} {:.4f}s -> {:.4f}s ({:+.0%})'.format(
+                name, previous, value, value / previous - 1
+            ))
+            regressions.append(name)
+    return regressions
+
+
+def parse_sizes(value):
+    return [int(size) for size in value.split(',')]
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='Benchmark ligafont on synthetic icon fonts.')
+    parser.add_argument('--sizes', type=parse_sizes, default=SIZES,
+                        help='comma separated glyph counts (default: 100,1000,10000,60000)')
+    parser.add_argument('--engines', type=lambda value: value.split(','), default=sorted(ENGINES),
+                        help='comma separated engines (default: all)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per benchmark, the fastest counts (default: %(default)s)')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'ligafont-bench-fonts'),
+                        help='where generated fonts are kept (default: %(default)s)')
+    parser.add_argument('--output', default='benchmark-results.json',
+                        help='JSON file for the results (default: %(default)s)')
+    parser.add_argument('--baseline', default=None,
+                        help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown against the baseline (default: %(default)s)')
+    return parser
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+
+    if not os.path.isdir(args.workdir):
+        os.makedirs(args.workdir)
+
+    results = run(args.sizes, args.engines, args.repeat, args.workdir)
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            'python': platform.python_version(),
+            'fonttools': fontTools.version,
+            'results': results,
+        }, file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
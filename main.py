@@ -6,12 +6,18 @@ from PyQt5.QtWidgets import QApplication, QMainWindow
 # Create an PyQT4 application object.
 from ui.controller import MainUIController
 
-app = QApplication(sys.argv)
-window = QMainWindow()
 
-logging.basicConfig(level=logging.DEBUG, format='%(levelname)s: %(message)s')
+def main():
+    app = QApplication(sys.argv)
+    window = QMainWindow()
 
-controller = MainUIController(window, app)
+    logging.basicConfig(level=logging.DEBUG, format='%(levelname)s: %(message)s')
 
-window.show()
-sys.exit(app.exec_())
\ No newline at end of file
+    controller = MainUIController(window, app)
+
+    window.show()
+    sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    main()
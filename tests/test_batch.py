@@ -0,0 +1,75 @@
+import json
+import os
+import tracemalloc
+
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import build_font, build_mapping
+from ui.batch import BatchJob, run_job
+
+
+def test_incremental_build_requires_the_same_source(tmp_path):
+    font_file = str(tmp_path / 'icons.ttf')
+    mapping_file = str(tmp_path / 'mapping.json')
+    job = BatchJob(font_file, mapping_file, str(tmp_path / 'out'))
+
+    build_font(font_file, 50)
+    with open(mapping_file, 'w') as file:
+        json.dump(build_mapping(40, 3), file)
+
+    def build():
+        result = run_job(job, incremental=True, extensions=['ttf'])
+        assert result['status'] == 'ok', result['error']
+        return result['incremental']
+
+    assert not build()
+    assert build()
+
+    # same glyph order, other metrics
+    font = TTFont(font_file)
+    font['hmtx'].metrics['icon0'] = (500, 0)
+    font.save(font_file)
+    assert not build()
+    assert build()
+
+    # a build of another tool replaced the output
+    build_font(os.path.join(job.output_dir, 'icons.ttf'), 60)
+    assert not build()
+
+
+def test_incremental_build_requires_the_same_options(tmp_path):
+    font_file = str(tmp_path / 'icons.ttf')
+    mapping_file = str(tmp_path / 'mapping.json')
+    job = BatchJob(font_file, mapping_file, str(tmp_path / 'out'))
+
+    build_font(font_file, 50)
+    with open(mapping_file, 'w') as file:
+        json.dump(build_mapping(40, 3), file)
+
+    def build(**options):
+        result = run_job(job, incremental=True, extensions=['ttf'], **options)
+        assert result['status'] == 'ok', result['error']
+        return result['incremental']
+
+    assert not build(deterministic=False)
+    assert build(deterministic=False)
+    assert not build(deterministic=True)
+    assert build(deterministic=True)
+    assert not build(engine='xml', deterministic=True)
+
+
+def test_trace_memory_keeps_tracing_started_before(tmp_path):
+    font_file = str(tmp_path / 'icons.ttf')
+    mapping_file = str(tmp_path / 'mapping.json')
+    build_font(font_file, 50)
+    with open(mapping_file, 'w') as file:
+        json.dump(build_mapping(40, 3), file)
+
+    tracemalloc.start()
+    try:
+        result = run_job(BatchJob(font_file, mapping_file, str(tmp_path / 'out')), extensions=['ttf'],
+                         trace_memory=True)
+        assert result['status'] == 'ok', result['error']
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,177 @@
+import string
+import time
+from io import BytesIO
+from xml.etree.ElementTree import Element
+
+import pytest
+from fontTools.fontBuilder import buildCmapSubTable
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+
+from benchmarks.fontgen import PUA_SIZE, PUA_START, build_font, build_mapping
+from ui.codeallocator import CodePointAllocator
+from ui.processor import FontProcessor
+from ui.tableprocessor import TableFontProcessor
+
+BMP_PUA = range(PUA_START, PUA_START + PUA_SIZE)
+PLANE_15 = 0xF0000
+
+# entries of each synthetic cmap subtable, and of the characters displaced
+CMAP_SIZE = 60000
+CHAR_COUNT = 500
+
+
+def test_allocate_moves_on_to_the_supplementary_planes():
+    allocator = CodePointAllocator(list(BMP_PUA[:-1]) + [PLANE_15])
+
+    assert allocator.allocate() == BMP_PUA[-1]
+    assert allocator.allocate() == PLANE_15 + 1
+    assert allocator.allocate(ord('a')) == PLANE_15 + 2
+
+
+def test_deterministic_allocate_falls_back_once_the_bmp_is_full():
+    allocator = CodePointAllocator(BMP_PUA[:-1], deterministic=True)
+
+    assert allocator.allocate(ord('a')) == BMP_PUA[-1]
+    assert allocator.allocate(ord('b')) == PLANE_15
+
+
+def test_deterministic_codes_do_not_depend_on_the_other_displaced_chars():
+    # the font fills the start of the Private Use Area
+    used = BMP_PUA[:PUA_SIZE - 1000]
+    displaced = list(range(0x4E00, 0x4E00 + 800))
+
+    allocator = CodePointAllocator(used, deterministic=True)
+    started = time.perf_counter()
+    codes = dict((code, allocator.allocate(code)) for code in displaced)
+    assert time.perf_counter() - started < 1
+
+    allocator = CodePointAllocator(used, deterministic=True)
+    fewer_codes = dict((code, allocator.allocate(code)) for code in displaced[::3])
+
+    assert all(fewer_codes[code] == codes[code] for code in fewer_codes)
+    assert len(set(codes.values())) == len(codes)
+    assert all(code in BMP_PUA[PUA_SIZE - 1000:] for code in codes.values())
+
+
+def test_allocate_fails_once_all_areas_are_full():
+    allocator = CodePointAllocator(code for start, end in CodePointAllocator.RANGES for code in range(start, end))
+
+    codes = [allocator.allocate() for _ in CodePointAllocator.RANGES]
+    assert codes == [end for _, end in CodePointAllocator.RANGES]
+    with pytest.raises(ValueError):
+        allocator.allocate()
+
+
+@pytest.fixture(scope='module')
+def full_pua_font(tmp_path_factory):
+    """An icon font filling the whole BMP Private Use Area, with glyphs for
+    the letters the ligatures are made of and a format 12 subtable.
+    """
+    filename = str(tmp_path_factory.mktemp('fonts') / 'icons.ttf')
+    build_font(filename, PUA_SIZE + 100)
+
+    font = TTFont(filename)
+    cmap = font.getBestCmap()
+    for index, letter in enumerate(string.ascii_lowercase):
+        cmap[ord(letter)] = 'icon{}'.format(PUA_SIZE + index)
+    cmap[PLANE_15] = 'icon{}'.format(PUA_SIZE + 50)
+
+    font['cmap'].tables = [
+        buildCmapSubTable(dict((code, name) for code, name in cmap.items() if code <= 0xFFFF), 4, 3, 1),
+        buildCmapSubTable(cmap, 12, 3, 10),
+    ]
+    font.save(filename)
+    return filename
+
+
+@pytest.mark.parametrize('processor_class', [FontProcessor, TableFontProcessor])
+def test_displaced_letters_go_to_the_supplementary_planes(full_pua_font, processor_class):
+    mapping = build_mapping(1000, 2)
+
+    started = time.perf_counter()
+    processor = processor_class(TTFont(full_pua_font), mapping)
+    try:
+        font = TTFont(BytesIO(processor.compile_font(processor.get_output_font())))
+    finally:
+        processor.cleanup()
+    assert time.perf_counter() - started < 60
+
+    cmap_4 = font['cmap'].getcmap(3, 1).cmap
+    cmap_12 = font['cmap'].getcmap(3, 10).cmap
+    codes = dict((name, code) for code, name in cmap_12.items())
+
+    for index, letter in enumerate(string.ascii_lowercase):
+        assert cmap_4[ord(letter)] == cmap_12[ord(letter)] == letter
+
+        # the BMP has no free Private Use code point left
+        displaced = 'icon{}'.format(PUA_SIZE + index)
+        assert codes[displaced] > PLANE_15
+        assert displaced not in cmap_4.values()
+
+    assert cmap_12[PLANE_15] == 'icon{}'.format(PUA_SIZE + 50)
+    assert all(cmap_4[code] == 'icon{}'.format(code - PUA_START) for code in BMP_PUA)
+    assert len(set(codes.values())) == len(cmap_12)
+
+
+def create_parser(processor_class, chars, used_codes):
+    """A processor with only the state parse_map works on, no font processed."""
+    processor = processor_class.__new__(processor_class)
+    processor.deterministic = False
+    processor.chars_to_add = chars
+    processor.charmap = {}
+    processor.glyph_by_name = {}
+    processor.allocator = processor.create_allocator(used_codes)
+    return processor
+
+
+def create_xml_map(cmap_format, cmap):
+    char_map = Element('cmap_format_{}'.format(cmap_format))
+    for code, name in cmap.items():
+        char_map.append(Element('map', attrib={'code': hex(code), 'name': name}))
+    return char_map
+
+
+def read_xml_map(char_map):
+    return dict((int(mapping.attrib['code'], 16), mapping.attrib['name']) for mapping in char_map.findall('map'))
+
+
+def create_table_map(cmap_format, cmap):
+    char_map = CmapSubtable.newSubtable(cmap_format)
+    char_map.cmap = dict(cmap)
+    return char_map
+
+
+def test_parse_map_of_large_subtables():
+    # a BMP subtable reaching into the Private Use Area, and one filling it
+    cmaps = [
+        (4, dict((code, 'glyph{}'.format(code)) for code in range(0x20, 0x20 + CMAP_SIZE))),
+        (12, dict((code, 'glyph{}'.format(code)) for code in range(0x4E00, 0x4E00 + CMAP_SIZE))),
+    ]
+    chars = [chr(code) for code in range(0x4E00, 0x4E00 + CHAR_COUNT)]
+    used_codes = [code for _, cmap in cmaps for code in cmap]
+
+    results = []
+    for processor_class, create_map, read_map in [
+        (FontProcessor, create_xml_map, read_xml_map),
+        (TableFontProcessor, create_table_map, lambda char_map: char_map.cmap),
+    ]:
+        char_maps = [create_map(cmap_format, cmap) for cmap_format, cmap in cmaps]
+        processor = create_parser(processor_class, chars, used_codes)
+
+        started = time.perf_counter()
+        for char_map in char_maps:
+            processor.parse_map(char_map)
+        assert time.perf_counter() - started < 3, processor_class.__name__
+
+        results.append(([read_map(char_map) for char_map in char_maps], processor.charmap, processor.glyph_by_name))
+
+    assert results[0] == results[1]
+
+    (cmap_4, cmap_12), charmap, _ = results[1]
+    assert len(charmap) == CHAR_COUNT
+    for char in chars:
+        assert cmap_4[ord(char)] == cmap_12[ord(char)] == char
+        displaced = 'glyph{}'.format(ord(char))
+        assert cmap_12[charmap[ord(char)]] == displaced
+        assert cmap_4.get(charmap[ord(char)], displaced) == displaced
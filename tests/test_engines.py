@@ -0,0 +1,67 @@
+import tracemalloc
+from io import BytesIO
+
+import pytest
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import build_font, build_mapping
+from ui.incrementalprocessor import IncrementalFontProcessor
+from ui.processor import FontProcessor
+from ui.tableprocessor import TableFontProcessor
+
+
+def build(processor_class, filename, mapping, **options):
+    processor = processor_class(TTFont(filename), mapping, **options)
+    try:
+        return TTFont(BytesIO(processor.compile_font(processor.get_output_font())))
+    finally:
+        processor.cleanup()
+
+
+def read_table(font, tag):
+    table = font[tag]
+    return dict((name, value) for name, value in vars(table).items() if name not in ('tableTag', 'panose'))
+
+
+@pytest.fixture(scope='module', params=['tt', 'cff'])
+def font_file(request, tmp_path_factory):
+    filename = str(tmp_path_factory.mktemp('fonts') / ('icons.otf' if request.param == 'cff' else 'icons.ttf'))
+    build_font(filename, 500, cff=request.param == 'cff')
+    return filename
+
+
+@pytest.mark.parametrize('passthrough', [False, True])
+def test_table_engine_matches_xml_engine(font_file, passthrough):
+    mapping = build_mapping(499, 3)
+
+    expected = build(FontProcessor, font_file, mapping)
+    font = build(TableFontProcessor, font_file, mapping, passthrough=passthrough)
+
+    assert font.getGlyphOrder() == expected.getGlyphOrder()
+    assert font.getBestCmap() == expected.getBestCmap()
+    assert IncrementalFontProcessor.read_ligatures(font)[1] == mapping
+    assert IncrementalFontProcessor.read_ligatures(expected)[1] == mapping
+    assert read_table(font, 'OS/2') == read_table(expected, 'OS/2')
+    assert font['OS/2'].usFirstCharIndex == ord('a')
+
+
+def build_peak_memory(processor_class, filename, mapping):
+    tracemalloc.start()
+    try:
+        processor = processor_class(TTFont(filename), mapping)
+        processor.run_phase('compile', lambda: processor.compile_font(processor.get_output_font()))
+    finally:
+        tracemalloc.stop()
+    processor.cleanup()
+    return processor.get_report()['peak_memory']
+
+
+def test_table_engine_peak_memory_is_below_xml_engine(tmp_path):
+    filename = str(tmp_path / 'icons.ttf')
+    build_font(filename, 1000)
+    mapping = build_mapping(999, 3)
+
+    peak_memory = build_peak_memory(TableFontProcessor, filename, mapping)
+    xml_peak_memory = build_peak_memory(FontProcessor, filename, mapping)
+
+    assert peak_memory * 2 < xml_peak_memory
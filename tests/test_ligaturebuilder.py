@@ -0,0 +1,75 @@
+import time
+from io import BytesIO
+
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import build_font, ligature_name
+from ui.ligaturebuilder import LigatureBuilder
+from ui.tableprocessor import TableFontProcessor
+
+
+def build_shared_prefix_mapping(count):
+    # every ligature starts with the same glyph, like arrow_up, arrow_down...
+    return dict(
+        ('a' + ligature_name(index, 3 + index % 4), 'icon{}'.format(index)) for index in range(count)
+    )
+
+
+def subtable_size(ligature_sets):
+    return LigatureBuilder.SUBTABLE_HEADER_SIZE + sum(
+        4 + LigatureBuilder.ligature_set_size(ligatures) for _, ligatures in ligature_sets
+    )
+
+
+def test_subtables_split_one_large_ligature_set():
+    mapping = build_shared_prefix_mapping(6000)
+    builder = LigatureBuilder(['.notdef'] + sorted(set(''.join(mapping))))
+    builder.add_mapping(mapping)
+
+    ligature_sets = builder.ligature_sets()
+    assert len(ligature_sets) == 1
+    assert LigatureBuilder.ligature_set_size(ligature_sets[0][1]) > LigatureBuilder.MAX_SUBTABLE_SIZE
+
+    subtables = builder.subtables()
+    assert len(subtables) > 1
+    for ligature_sets_part in subtables:
+        assert subtable_size(ligature_sets_part) <= LigatureBuilder.MAX_SUBTABLE_SIZE
+
+    # the parts of the set follow each other longest first
+    parts = [ligatures for ligature_sets_part in subtables for _, ligatures in ligature_sets_part]
+    assert sum(parts, []) == ligature_sets[0][1]
+
+
+def test_subtables_keep_sets_that_fit_whole():
+    mapping = dict(
+        (ligature_name(index, 4), 'icon{}'.format(index)) for index in range(26 * 500)
+    )
+    builder = LigatureBuilder(['.notdef'] + sorted(set(''.join(mapping))))
+    builder.add_mapping(mapping)
+
+    first_glyphs = [first for ligature_sets in builder.subtables() for first, _ in ligature_sets]
+    assert len(first_glyphs) == len(set(first_glyphs)) == 26
+
+
+def test_table_engine_builds_one_large_ligature_set(tmp_path):
+    mapping = build_shared_prefix_mapping(6000)
+    filename = str(tmp_path / 'icons.ttf')
+    build_font(filename, len(mapping) + 1)
+
+    started = time.perf_counter()
+    processor = TableFontProcessor(TTFont(filename), mapping)
+    data = processor.compile_font(processor.get_output_font())
+    # fontTools needed minutes to resolve the overflows of one subtable
+    assert time.perf_counter() - started < 60
+
+    font = TTFont(BytesIO(data))
+    lookup = font['GSUB'].table.LookupList.Lookup[0]
+    subtables = TableFontProcessor.get_subtables(lookup)
+    assert len(subtables) > 1
+
+    built = {}
+    for subst in subtables:
+        for start_char, ligatures in subst.ligatures.items():
+            for ligature in ligatures:
+                built[start_char + ''.join(ligature.Component)] = ligature.LigGlyph
+    assert built == mapping
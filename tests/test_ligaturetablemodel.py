@@ -0,0 +1,43 @@
+import sys
+import tracemalloc
+
+from PyQt5.QtCore import QObject
+
+from ui.ligaturetablemodel import LigatureTableModel
+
+
+class QObjectLigatureItem(QObject):
+    """A row as the model used to store it, one QObject per glyph."""
+
+    def __init__(self, name, ligature):
+        super(QObjectLigatureItem, self).__init__()
+        self.data = [name, ligature]
+
+
+def traced_size(func, names):
+    tracemalloc.start()
+    try:
+        result = func(names)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size
+
+
+def fill_model(names):
+    model = LigatureTableModel([], ['Name', 'Ligature'])
+    model.set_names(names)
+    model.restore_mapping()
+    return model
+
+
+def test_columns_take_a_tenth_of_the_memory_of_per_glyph_objects():
+    # names are shared by both and interned up front, only rows are measured.
+    # tracemalloc only sees Python allocations, not the C++ object behind each
+    # QObject, so the per glyph objects take even more memory than measured
+    names = [sys.intern('icon{}'.format(index)) for index in range(20000)]
+
+    size = traced_size(fill_model, names)
+    per_glyph_size = traced_size(lambda names: [QObjectLigatureItem(name, '') for name in names], names)
+
+    assert size * 10 < per_glyph_size
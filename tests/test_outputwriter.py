@@ -0,0 +1,27 @@
+import os
+import stat
+
+from ui.outputwriter import write_chunks_if_changed, write_if_changed
+
+
+def test_outputs_get_the_mode_of_the_umask(tmp_path):
+    umask = os.umask(0o027)
+    try:
+        write_if_changed(str(tmp_path / 'icons.ttf'), b'font')
+        write_chunks_if_changed(str(tmp_path / 'icons.html'), [b'<html>', b'</html>'])
+    finally:
+        os.umask(umask)
+
+    for name in ('icons.ttf', 'icons.html'):
+        assert stat.S_IMODE(os.stat(str(tmp_path / name)).st_mode) == 0o640
+    assert sorted(os.listdir(str(tmp_path))) == ['icons.html', 'icons.ttf']
+
+
+def test_write_if_changed_keeps_unchanged_files(tmp_path):
+    filename = str(tmp_path / 'icons.ttf')
+
+    assert write_if_changed(filename, b'font')
+    assert not write_if_changed(filename, b'font')
+    assert write_if_changed(filename, b'other font')
+    with open(filename, 'rb') as file:
+        assert file.read() == b'other font'
@@ -0,0 +1,58 @@
+import glob
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import PUA_START, build_font, build_mapping
+from ui.incrementalprocessor import IncrementalFontProcessor
+from ui.processor import FontProcessor
+from ui.tableprocessor import TableFontProcessor
+
+BUILDS = 20
+GLYPHS = 300
+
+
+def list_workspaces():
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), 'ligafont-*')))
+
+
+def build(font_file, mapping, processor_class, output_dir):
+    os.makedirs(output_dir)
+
+    ttf = TTFont(font_file)
+    try:
+        processor = processor_class(ttf, mapping)
+        processor.save_files(output_dir, 'icons', ['ttf'])
+    finally:
+        ttf.close()
+    return TTFont(os.path.join(output_dir, 'icons.ttf'))
+
+
+def test_concurrent_builds_keep_to_their_own_mapping(tmp_path):
+    font_file = str(tmp_path / 'icons.ttf')
+    build_font(font_file, GLYPHS)
+
+    # every build gets a mapping of its own, so mixed up state shows
+    mappings = [build_mapping(100 + index * 7, 3 + index % 3) for index in range(BUILDS)]
+    processor_classes = [FontProcessor, TableFontProcessor]
+
+    workspaces = list_workspaces()
+    with ThreadPoolExecutor(max_workers=BUILDS) as executor:
+        futures = [
+            executor.submit(
+                build, font_file, mapping, processor_classes[index % 2], str(tmp_path / 'build{}'.format(index))
+            )
+            for index, mapping in enumerate(mappings)
+        ]
+        fonts = [future.result() for future in futures]
+
+    for index, (font, mapping) in enumerate(zip(fonts, mappings)):
+        cmap = font.getBestCmap()
+        for letter in set(''.join(mapping)):
+            assert cmap[ord(letter)] == letter, index
+        assert cmap[PUA_START] == 'icon0', index
+        assert IncrementalFontProcessor.read_ligatures(font)[1] == mapping, index
+
+    assert list_workspaces() == workspaces
@@ -0,0 +1,17 @@
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import build_font, build_mapping
+from ui.preview import CHUNK_SIZE, PARALLEL_MIN_GLYPHS, PreviewRenderer
+from ui.processor import FontProcessor
+
+
+def test_renders_in_process_unless_given_workers(tmp_path):
+    filename = str(tmp_path / 'icons.ttf')
+    build_font(filename, 10)
+    font_data = FontProcessor.compile_font(TTFont(filename))
+    mapping = build_mapping(9, 3)
+
+    assert PreviewRenderer(font_data, mapping).get_workers(10 * PARALLEL_MIN_GLYPHS) == 1
+    assert PreviewRenderer(font_data, mapping, 4).get_workers(PARALLEL_MIN_GLYPHS - 1) == 1
+    assert PreviewRenderer(font_data, mapping, 4).get_workers(10 * PARALLEL_MIN_GLYPHS) == 4
+    assert PreviewRenderer(font_data, mapping, 64).get_workers(4 * CHUNK_SIZE) == 4
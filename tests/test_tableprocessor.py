@@ -0,0 +1,27 @@
+from fontTools.ttLib import TTFont
+
+from benchmarks.fontgen import build_font, build_mapping
+from ui.tableprocessor import TableFontProcessor
+
+
+def build_classes(filename, **options):
+    ttf = TTFont(filename)
+    class_defs = ttf['GDEF'].table.GlyphClassDef.classDefs
+    class_defs['icon0'] = 3
+
+    processor = TableFontProcessor(ttf, build_mapping(10, 3), **options)
+    return processor.chars_to_add, processor.get_output_font()['GDEF'].table.GlyphClassDef.classDefs
+
+
+def test_add_gdef_keeps_classes_with_keep_lookups(tmp_path):
+    filename = str(tmp_path / 'icons.ttf')
+    build_font(filename, 20)
+
+    chars, class_defs = build_classes(filename, keep_lookups=True)
+    assert class_defs['icon0'] == 3
+    assert class_defs['icon1'] == 1
+    assert all(class_defs[char] == 1 for char in chars)
+
+    chars, class_defs = build_classes(filename)
+    assert class_defs['icon0'] == class_defs['icon1'] == 2
+    assert all(class_defs[char] == 1 for char in chars)
@@ -0,0 +1,367 @@
+import argparse
+import json
+import logging
+import os
+import time
+import traceback
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from fontTools.ttLib import TTFont
+
+from ui.buildcache import BuildCache
+from ui.engines import ENGINES, DEFAULT_ENGINE
+from ui.incrementalprocessor import IncrementalFontProcessor
+from ui.outputwriter import (dump_manifest, hash_data, hash_file, manifest_filename, read_manifest,
+                             source_filename, write_if_changed)
+from ui.processor import format_sizes, load_font, parse_extensions
+from ui.profiles import DEFAULT_PROFILE, PROFILES, get_profile
+from ui.tableprocessor import TableFontProcessor
+
+_logger = logging.getLogger(__name__)
+
+
+class BatchJob(object):
+
+    def __init__(self, input_file, mapping_file, output_dir, font_name=None):
+        self.input_file = input_file
+        self.mapping_file = mapping_file
+        self.output_dir = output_dir
+
+        if not font_name:
+            font_name = os.path.splitext(os.path.basename(input_file))[0]
+        self.font_name = font_name
+
+    @classmethod
+    def from_dict(cls, data, base_dir=''):
+        def path(key):
+            return os.path.join(base_dir, data[key])
+
+        return cls(path('input'), path('mapping'), path('output_dir'), data.get('font_name'))
+
+
+def load_manifest(filename):
+    """Read the list of jobs from a JSON manifest.
+
+    The manifest is either a list of jobs or an object with a "jobs" list. Each
+    job has the keys "input", "mapping", "output_dir" and optionally
+    "font_name". Relative paths are resolved against the manifest directory.
+    """
+    with open(filename) as file:
+        manifest = json.load(file)
+
+    if isinstance(manifest, dict):
+        manifest = manifest['jobs']
+
+    base_dir = os.path.dirname(os.path.abspath(filename))
+    return [BatchJob.from_dict(job, base_dir) for job in manifest]
+
+
+def load_mapping(filename):
+    with open(filename, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def run_job(job, engine=DEFAULT_ENGINE, extensions=None, cache_dir=None,
+            cache_max_bytes=BuildCache.DEFAULT_MAX_BYTES, incremental=False, trace_memory=False,
+            preview_workers=1, **processor_options):
+    """Build one job and return a JSON serializable result.
+
+    The result holds the per phase report of the processor unless the outputs
+    came from the cache. trace_memory adds memory peaks to it, at the cost of
+    slower builds. The preview is rendered by up to preview_workers processes.
+    """
+    result = {
+        'font_name': job.font_name,
+        'input': job.input_file,
+        'status': 'ok',
+        'error': None,
+        'cached': False,
+        'incremental': False,
+        'cache': None,
+        'timings': {},
+        'report': None,
+    }
+    timings = result['timings']
+    started = time.perf_counter()
+
+    # tracing someone else started is left running
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+
+    try:
+        processor_class = ENGINES[engine]
+        if extensions is None:
+            extensions = get_profile(processor_options.get('profile')).extensions
+
+        mapping = load_mapping(job.mapping_file)
+
+        if not os.path.isdir(job.output_dir):
+            os.makedirs(job.output_dir)
+
+        source_hash = BuildCache.hash_file(job.input_file) if cache_dir or incremental else None
+
+        cache = key = None
+        if cache_dir:
+            cache = BuildCache(cache_dir, cache_max_bytes)
+            key = BuildCache.make_key(
+                source_hash,
+                mapping,
+                job.font_name,
+                extensions,
+                processor_class.VERSION,
+                engine=engine,
+                **processor_options
+            )
+            result['cached'] = cache.fetch(key, job.output_dir) is not None
+
+        if not result['cached']:
+            # the source font is only read for full builds, it decompiles all
+            # tables while loading, unless the tables ligafont does not change
+            # are copied as they are
+            step = time.perf_counter()
+            ttf = previous = None
+            if incremental:
+                previous = load_previous_output(job, source_hash, engine, processor_options)
+            if not previous:
+                ttf = load_font(job.input_file, decompile=not processor_options.get('passthrough'))
+            timings['load'] = time.perf_counter() - step
+
+            step = time.perf_counter()
+            if previous:
+                processor = IncrementalFontProcessor(
+                    previous, mapping, preview_workers=preview_workers, **processor_options
+                )
+                previous.close()
+                result['incremental'] = True
+            else:
+                processor = processor_class(ttf, mapping, preview_workers=preview_workers, **processor_options)
+            timings['process'] = time.perf_counter() - step
+
+            step = time.perf_counter()
+            filenames = processor.save_files(job.output_dir, job.font_name, extensions)
+            timings['save'] = time.perf_counter() - step
+            if ttf is not None:
+                ttf.close()
+
+            result['report'] = processor.get_report()
+
+            # patched outputs depend on the earlier build, only full builds are cached
+            if cache and not result['incremental']:
+                cache.store(key, job.output_dir, filenames)
+
+        # a subset output lacks glyphs of the source, it can not be patched
+        if incremental and not processor_options.get('subset'):
+            record_source(job, source_hash, engine, processor_options)
+
+        if cache:
+            result['cache'] = cache.stats()
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = '{}: {}'.format(type(e).__name__, e)
+        _logger.debug(traceback.format_exc())
+
+    if start_tracing:
+        tracemalloc.stop()
+
+    timings['total'] = time.perf_counter() - started
+    return result
+
+
+def get_output_ttf(job, hashed_names=False):
+    """The path of the TTF output of the job, or None if there is none."""
+    filename = '{}.ttf'.format(job.font_name)
+
+    if hashed_names:
+        try:
+            filename = read_manifest(os.path.join(job.output_dir, manifest_filename(job.font_name)))[filename]
+        except (IOError, ValueError, KeyError):
+            return None
+
+    filename = os.path.join(job.output_dir, filename)
+    if not os.path.exists(filename):
+        return None
+    return filename
+
+
+def record_source(job, source_hash, engine, processor_options):
+    """Write the hashes of the source font and of the TTF output, and how
+    it was built, next to the outputs for load_previous_output to check.
+    """
+    filename = get_output_ttf(job, processor_options.get('hashed_names'))
+    if filename:
+        write_if_changed(os.path.join(job.output_dir, source_filename(job.font_name)), dump_manifest({
+            'source': source_hash,
+            'ttf': hash_file(filename),
+            'engine': engine,
+            'options': processor_options,
+        }))
+
+
+def load_previous_output(job, source_hash, engine, processor_options):
+    """Open the TTF output of an earlier build of the job, if it was built
+    from the same source font with the same engine and options, and was not
+    replaced since.
+    """
+    filename = get_output_ttf(job, processor_options.get('hashed_names'))
+    if not filename:
+        return None
+
+    try:
+        record = read_manifest(os.path.join(job.output_dir, source_filename(job.font_name)))
+    except (IOError, ValueError):
+        return None
+
+    with open(filename, 'rb') as file:
+        data = file.read()
+
+    built = (record.get('source'), record.get('engine'), record.get('options'))
+    if built != (source_hash, engine, processor_options) or record.get('ttf') != hash_data(data):
+        return None
+    return TTFont(BytesIO(data))
+
+
+def run_batch(jobs, workers=None, **options):
+    """Process all jobs in a process pool and return their results in job order.
+
+    The options are passed on to run_job. Unless they say otherwise, the
+    cores the jobs leave idle render the previews.
+    """
+    cpu_count = os.cpu_count() or 1
+    busy = min(workers or cpu_count, len(jobs)) or 1
+    options.setdefault('preview_workers', max(1, cpu_count // busy))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, job, **options) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def merge_cache_stats(results):
+    stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+
+    for result in results:
+        for name, value in (result['cache'] or {}).items():
+            stats[name] += value
+    return stats
+
+
+def format_result(result):
+    timings = ' '.join(
+        '{}={:.3f}s'.format(name, result['timings'][name])
+        for name in ('load', 'process', 'save', 'total')
+        if name in result['timings']
+    )
+    if result['cached']:
+        timings += ' (cached)'
+    elif result['incremental']:
+        timings += ' (incremental)'
+
+    line = '{:<6} {:<30} {}'.format(result['status'].upper(), result['font_name'], timings)
+
+    if result['report'] and any('full_size' in size for size in result['report']['sizes'].values()):
+        line += '\n       {}'.format(format_sizes(result['report']['sizes']))
+    if result['error']:
+        line += '\n       {}'.format(result['error'])
+    return line
+
+
+def add_build_arguments(parser):
+    """Add the options shared by all commands that build fonts."""
+    parser.add_argument('manifest', help='JSON manifest listing the jobs')
+    parser.add_argument('--engine', choices=sorted(ENGINES), default=DEFAULT_ENGINE,
+                        help='processing engine (default: %(default)s)')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help='output formats and compression: dev writes TTF only, release compresses hardest '
+                             '(default: %(default)s)')
+    parser.add_argument('--formats', type=parse_extensions, default=None,
+                        help='comma separated output formats (default: those of the profile)')
+    parser.add_argument('--deterministic', action='store_true',
+                        help='give displaced glyphs stable Private Use Area code points')
+    parser.add_argument('--keep-lookups', action='store_true',
+                        help='keep the GSUB/GPOS lookups of the input fonts (table engine only)')
+    parser.add_argument('--passthrough', action='store_true',
+                        help='copy the tables ligafont does not change as they are (table engine only)')
+    parser.add_argument('--hashed-names', action='store_true',
+                        help='name the fonts after a hash of their content and write a manifest of the names')
+    parser.add_argument('--subset', action='store_true',
+                        help='only keep the mapped glyphs and the glyphs of the ligature characters')
+
+
+def get_processor_options(parser, args, table_only=()):
+    """The processor options chosen by the arguments of add_build_arguments.
+
+    table_only lists further flags that need a table based engine.
+    """
+    flags = ['keep_lookups', 'passthrough'] + list(table_only)
+    if any(getattr(args, flag) for flag in flags) and not issubclass(ENGINES[args.engine], TableFontProcessor):
+        parser.error('{} need the table engine'.format(
+            ', '.join('--' + flag.replace('_', '-') for flag in flags)
+        ))
+
+    processor_options = {'deterministic': args.deterministic}
+    if args.keep_lookups:
+        processor_options['keep_lookups'] = True
+    if args.passthrough:
+        processor_options['passthrough'] = True
+    if args.hashed_names:
+        processor_options['hashed_names'] = True
+    if args.subset:
+        processor_options['subset'] = True
+    if args.profile != DEFAULT_PROFILE:
+        processor_options['profile'] = args.profile
+    return processor_options
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='Add ligatures to many icon fonts without the GUI.')
+    add_build_arguments(parser)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes (default: number of cores)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='patch the TTF output of an earlier build instead of rebuilding it (table engine only)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='reuse outputs of earlier builds stored in this directory')
+    parser.add_argument('--cache-size', type=int, default=BuildCache.DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='maximum size of the build cache in MB (default: %(default)s)')
+    parser.add_argument('--report', default=None,
+                        help='write the results with the timings of each build phase to this JSON file')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record the peak memory of each build phase (slower)')
+    return parser
+
+
+def main(argv=None):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    processor_options = get_processor_options(parser, args, ['incremental'])
+
+    jobs = load_manifest(args.manifest)
+    started = time.perf_counter()
+    results = run_batch(
+        jobs,
+        args.workers,
+        engine=args.engine,
+        extensions=args.formats,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_size * 1024 * 1024,
+        incremental=args.incremental,
+        trace_memory=args.trace_memory,
+        **processor_options
+    )
+
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    for result in results:
+        print(format_result(result))
+
+    failed = [result for result in results if result['status'] != 'ok']
+    print('{} jobs, {} failed, {:.3f}s'.format(len(results), len(failed), time.perf_counter() - started))
+
+    if args.cache_dir:
+        print('cache: {hits} hits, {misses} misses, {bytes_saved} bytes saved'.format(**merge_cache_stats(results)))
+
+    return 1 if failed else 0
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from ui.outputwriter import hash_file, write_if_changed
+
+
+class BuildCache(object):
+    """On-disk cache of build outputs, addressed by a hash of everything the
+    output depends on.
+
+    Each entry is a directory holding the output files of one build. Entries
+    are evicted least recently used first once the cache grows past max_bytes.
+    """
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    hash_file = staticmethod(hash_file)
+
+    @staticmethod
+    def hash_mapping(mapping):
+        data = json.dumps(mapping, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def make_key(cls, font_hash, mapping, font_name, extensions, version, **options):
+        data = json.dumps({
+            'font': font_hash,
+            'mapping': cls.hash_mapping(mapping),
+            'name': font_name,
+            'formats': list(extensions),
+            'version': version,
+            'options': options,
+        }, sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def fetch(self, key, output_dir):
+        """Copy the outputs of a cached build to output_dir.
+
+        Returns the copied file names, or None on a cache miss. Files that
+        already hold the cached content are left alone.
+        """
+        entry_dir = self._entry_dir(key)
+
+        try:
+            filenames = sorted(os.listdir(entry_dir))
+        except OSError:
+            self.misses += 1
+            return None
+
+        copied = 0
+        try:
+            for filename in filenames:
+                with open(os.path.join(entry_dir, filename), 'rb') as file:
+                    data = file.read()
+                write_if_changed(os.path.join(output_dir, filename), data)
+                copied += len(data)
+        except IOError:
+            # evicted by a concurrent build while copying
+            self.misses += 1
+            return None
+
+        self.bytes_saved += copied
+
+        # the directory mtime is the last use for the LRU eviction
+        os.utime(entry_dir, None)
+
+        self.hits += 1
+        return filenames
+
+    def store(self, key, output_dir, filenames):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+
+        tmp_dir = tempfile.mkdtemp(prefix='.{}.'.format(key), dir=self.directory)
+        try:
+            for filename in filenames:
+                shutil.copyfile(os.path.join(output_dir, filename), os.path.join(tmp_dir, filename))
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # another build published the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(entry_dir):
+                raise
+
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+
+        for key in os.listdir(self.directory):
+            entry_dir = self._entry_dir(key)
+            if key.startswith('.') or not os.path.isdir(entry_dir):
+                continue
+
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry_dir, filename))
+                    for filename in os.listdir(entry_dir)
+                )
+                entries.append((os.path.getmtime(entry_dir), size, entry_dir))
+            except OSError:
+                # evicted by a concurrent build
+                continue
+            total += size
+
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_saved': self.bytes_saved,
+        }
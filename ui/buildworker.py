@@ -0,0 +1,53 @@
+import sys
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class BuildCancelled(Exception):
+    pass
+
+
+class BuildSignals(QObject):
+    progress = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+
+
+class BuildWorker(QRunnable):
+    """Runs a build on a QThreadPool thread.
+
+    build is called with a progress callback taking the name of each phase.
+    The outcome is reported through the signals of self.signals, which live
+    on the thread that created the worker, so connected slots run there.
+    cancel() stops the build when it starts its next phase.
+    """
+
+    def __init__(self, build):
+        super(BuildWorker, self).__init__()
+
+        self.build = build
+        self.signals = BuildSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def report_progress(self, phase):
+        if self._cancelled.is_set():
+            raise BuildCancelled()
+        self.signals.progress.emit(phase)
+
+    def run(self):
+        try:
+            result = self.build(self.report_progress)
+        except BuildCancelled:
+            self.signals.cancelled.emit()
+        except Exception:
+            self.signals.failed.emit(sys.exc_info())
+        else:
+            self.signals.finished.emit(result)
@@ -0,0 +1,76 @@
+class CodePointAllocator(object):
+    """Hands out code points from the Private Use Areas that no cmap subtable
+    uses yet.
+
+    Codes are taken from the BMP Private Use Area first and from the
+    supplementary Private Use planes 15 and 16 once it is full. In
+    deterministic mode a displaced code point is hashed into the BMP Private
+    Use Area codes the font leaves free (in a font without any, U+0061 goes to
+    U+E061), so its new code only depends on the font. Displaced code points
+    hashed to a slot already taken share the cursor of the other allocations,
+    only their codes depend on which other characters were displaced.
+    """
+    RANGES = [
+        (0xE000, 0xF8FF),
+        (0xF0000, 0xFFFFD),
+        (0x100000, 0x10FFFD),
+    ]
+
+    def __init__(self, used=(), deterministic=False):
+        self.used = set(used)
+        self.deterministic = deterministic
+
+        self._range = 0
+        self._cursor = self.RANGES[0][0]
+        # the free BMP Private Use Area codes deterministic codes are hashed
+        # into, listed on the first allocation
+        self._free = None
+
+    def reserve(self, code):
+        self.used.add(code)
+
+    def allocate(self, source_code=None):
+        code = None
+        if self.deterministic and source_code is not None:
+            code = self._preferred_code(source_code)
+        if code is None or code in self.used:
+            code = self._allocate_next()
+
+        self.used.add(code)
+        return code
+
+    def _preferred_code(self, source_code):
+        if self._free is None:
+            start, end = self.RANGES[0]
+            self._free = [code for code in range(start, end + 1) if code not in self.used]
+
+        if not self._free:
+            return None
+        return self._free[source_code % len(self._free)]
+
+    def _allocate_next(self):
+        # the cursor only moves forward, so each used code is skipped at most
+        # once over the lifetime of the allocator
+        while self._range < len(self.RANGES):
+            start, end = self.RANGES[self._range]
+
+            while self._cursor <= end:
+                code = self._cursor
+                self._cursor += 1
+                if code not in self.used:
+                    return code
+
+            self._range += 1
+            if self._range < len(self.RANGES):
+                self._cursor = self.RANGES[self._range][0]
+
+        raise ValueError('no free code point left in the Private Use Areas')
+
+
+def fits_cmap_format(code, cmap_format):
+    """Whether a cmap subtable of the given format can hold the code point."""
+    if cmap_format == 0:
+        return code <= 0xFF
+    if cmap_format in (2, 4, 6):
+        return code <= 0xFFFF
+    return True
@@ -1,4 +1,3 @@
-import hashlib
 import os
 import traceback
 
@@ -9,7 +8,8 @@ from PyQt5.QtCore import QObject, pyqtSlot
 from PyQt5.QtWidgets import QFileDialog
 
 from ui.itemlistcontroller import ItemListController
-from ui.settings import get_setting, set_setting
+from ui.profiles import DEFAULT_PROFILE, PROFILES
+from ui.settings import flush_settings, get_setting, set_setting
 from ui.views.mainwindow import Ui_MainWindow
 
 _logger = logging.getLogger(__name__)
@@ -36,9 +36,25 @@ class MainUIController(QObject):
         self.ui.input_button.clicked.connect(self.load_input_file)
         self.ui.output_button.clicked.connect(self.open_output_dir)
         self.ui.save_button.clicked.connect(self.item_list_ctrl.save)
+        self.ui.cancel_button.clicked.connect(self.item_list_ctrl.cancel_build)
         self.ui.reopen_output.clicked.connect(self.reopen_output_dir)
         self.ui.reopen_input.clicked.connect(self.reopen_input_file)
 
+        self.ui.profile_box.addItems(sorted(PROFILES))
+        self.ui.profile_box.setCurrentText(get_setting('profile', DEFAULT_PROFILE))
+        self.ui.profile_box.currentTextChanged.connect(self.set_profile)
+
+        self._app.aboutToQuit.connect(self.shutdown)
+
+    @pyqtSlot(str)
+    def set_profile(self, name):
+        set_setting('profile', name)
+
+    @pyqtSlot()
+    def shutdown(self):
+        self.item_list_ctrl.save_font_mapping()
+        flush_settings()
+
     def log(self, message):
         message = str(message)
         self.ui.statusbar.showMessage(message)
@@ -0,0 +1,18 @@
+from ui.processor import FontProcessor
+from ui.tableprocessor import TableFontProcessor
+
+ENGINES = {
+    FontProcessor.ENGINE: FontProcessor,
+    TableFontProcessor.ENGINE: TableFontProcessor,
+}
+DEFAULT_ENGINE = TableFontProcessor.ENGINE
+
+
+def get_processor_class(engine=None):
+    if not engine:
+        engine = DEFAULT_ENGINE
+
+    if engine not in ENGINES:
+        raise ValueError('unknown processing engine: {}'.format(engine))
+
+    return ENGINES[engine]
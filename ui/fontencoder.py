@@ -0,0 +1,85 @@
+import logging
+import zlib
+from io import BytesIO
+
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.sfnt import SFNTWriter, WOFFDirectoryEntry, ZOPFLI_LEVELS
+from fontTools.ttLib.woff2 import WOFF2FlavorData
+
+_logger = logging.getLogger(__name__)
+
+try:
+    from zopfli.zlib import compress as zopfli_compress
+except ImportError:
+    zopfli_compress = None
+
+
+def compress_table(data, profile):
+    if profile.zopfli and profile.zlib_level:
+        if zopfli_compress:
+            return zopfli_compress(data, numiterations=ZOPFLI_LEVELS[profile.zlib_level])
+        _logger.debug('zopfli is not installed, compressing with zlib')
+
+    return zlib.compress(data, profile.zlib_level)
+
+
+class ProfileWOFFEntry(WOFFDirectoryEntry):
+    """A WOFF table entry compressed as its profile says."""
+
+    def __init__(self, profile):
+        super(ProfileWOFFEntry, self).__init__()
+        self.profile = profile
+
+    def encodeData(self, data):
+        self.origLength = len(data)
+
+        if not self.uncompressed:
+            compressed = compress_table(data, self.profile)
+            if len(compressed) < self.origLength:
+                self.length = len(compressed)
+                return compressed
+
+        self.length = self.origLength
+        return data
+
+
+class ProfileWOFFWriter(SFNTWriter):
+    """Writes WOFF with the compression of a build profile.
+
+    fontTools takes the zlib level and the choice of zopfli from globals of
+    fontTools.ttLib.sfnt, which builds running at the same time would share.
+    """
+
+    def __init__(self, file, num_tables, sfnt_version, profile):
+        super(ProfileWOFFWriter, self).__init__(file, num_tables, sfnt_version, 'woff')
+        self.profile = profile
+        self.DirectoryEntry = self.create_entry
+
+    def create_entry(self):
+        return ProfileWOFFEntry(self.profile)
+
+
+def encode_woff(data, profile):
+    """Wrap a compiled sfnt binary in WOFF, copying the tables as they are."""
+    ttf = TTFont(BytesIO(data))
+    tags = [tag for tag in ttf.keys() if tag != 'GlyphOrder']
+
+    buffer = BytesIO()
+    writer = ProfileWOFFWriter(buffer, len(tags), ttf.sfntVersion, profile)
+    for tag in tags:
+        writer[tag] = ttf.reader[tag]
+    writer.close()
+    return buffer.getvalue()
+
+
+def encode_woff2(data, profile):
+    """Wrap a compiled sfnt binary in WOFF2, tables are only decompiled to
+    be transformed.
+    """
+    ttf = TTFont(BytesIO(data), recalcTimestamp=False)
+    ttf.flavor = 'woff2'
+    ttf.flavorData = WOFF2FlavorData(transformedTables=profile.woff2_transforms)
+
+    buffer = BytesIO()
+    ttf.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,183 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+
+
+class TrigramIndex(object):
+    """Rows by the lower case trigrams of their value.
+
+    Substrings of three or more characters are looked up by intersecting the
+    rows of their trigrams, which leaves few candidates to check.
+    """
+    # share of the query trigrams a value needs for a fuzzy match
+    FUZZY_THRESHOLD = 0.6
+
+    def __init__(self, values=()):
+        self.values = [value.lower() for value in values]
+        self._rows = defaultdict(set)
+
+        trigrams = self.trigrams
+        for row, value in enumerate(self.values):
+            if len(value) > 2:
+                for trigram in trigrams(value):
+                    self._rows[trigram].add(row)
+
+    @staticmethod
+    def trigrams(value):
+        return set(value[index:index + 3] for index in range(len(value) - 2))
+
+    def add(self, row, value):
+        value = value.lower()
+        if row == len(self.values):
+            self.values.append(value)
+        else:
+            self.values[row] = value
+
+        for trigram in self.trigrams(value):
+            self._rows[trigram].add(row)
+
+    def remove(self, row):
+        for trigram in self.trigrams(self.values[row]):
+            self._rows[trigram].discard(row)
+        self.values[row] = ''
+
+    def search(self, text):
+        """Rows whose value contains text, which is at least 3 characters."""
+        text = text.lower()
+        postings = sorted((self._rows.get(trigram, ()) for trigram in self.trigrams(text)), key=len)
+        if not postings or not postings[0]:
+            return set()
+
+        rows = set(postings[0]).intersection(*postings[1:])
+        if len(text) == 3:
+            return rows
+
+        values = self.values
+        return set(row for row in rows if text in values[row])
+
+    def fuzzy_search(self, text):
+        """Rows sharing most of the trigrams of text, for typos."""
+        trigrams = self.trigrams(text.lower())
+        counts = Counter()
+        for trigram in trigrams:
+            counts.update(self._rows.get(trigram, ()))
+
+        needed = max(1, int(len(trigrams) * self.FUZZY_THRESHOLD + 0.5))
+        return set(row for row, count in counts.items() if count >= needed)
+
+
+class NameIndex(TrigramIndex):
+    """Glyph names, searchable by prefix and substring.
+
+    The prefix index is the list of names in sorted order, where all names
+    starting with a prefix form one range found by bisection.
+    """
+
+    def __init__(self, names):
+        super(NameIndex, self).__init__(names)
+
+        values = self.values
+        self._sorted_rows = sorted(range(len(values)), key=values.__getitem__)
+        self._sorted_values = [values[row] for row in self._sorted_rows]
+
+    def add(self, row, value):
+        super(NameIndex, self).add(row, value)
+
+        position = bisect_right(self._sorted_values, self.values[row])
+        self._sorted_values.insert(position, self.values[row])
+        self._sorted_rows.insert(position, row)
+
+    def prefix_search(self, prefix):
+        prefix = prefix.lower()
+        start = bisect_left(self._sorted_values, prefix)
+        end = bisect_left(self._sorted_values, prefix + '\U0010ffff', start)
+        return set(self._sorted_rows[start:end])
+
+
+class LigatureIndex(TrigramIndex):
+    """Assigned ligatures, with the rows of each ligature for finding
+    unassigned glyphs and ligatures assigned more than once.
+    """
+
+    def __init__(self, ligatures):
+        super(LigatureIndex, self).__init__(ligatures)
+        self.ligatures = list(ligatures)
+
+        self.rows_by_ligature = defaultdict(set)
+        for row, ligature in enumerate(self.ligatures):
+            self.rows_by_ligature[ligature].add(row)
+
+    def add(self, row, value):
+        super(LigatureIndex, self).add(row, value)
+        if row == len(self.ligatures):
+            self.ligatures.append(value)
+        else:
+            self.ligatures[row] = value
+        self.rows_by_ligature[value].add(row)
+
+    def remove(self, row):
+        ligature = self.ligatures[row]
+        rows = self.rows_by_ligature[ligature]
+        rows.discard(row)
+        if not rows:
+            del self.rows_by_ligature[ligature]
+        super(LigatureIndex, self).remove(row)
+
+    def set(self, row, value):
+        self.remove(row)
+        self.add(row, value)
+
+    def unassigned(self):
+        return set(self.rows_by_ligature.get('', ()))
+
+    def assigned(self):
+        return set(range(len(self.ligatures))) - self.unassigned()
+
+    def conflicts(self):
+        return set().union(*(
+            rows for ligature, rows in self.rows_by_ligature.items() if ligature and len(rows) > 1
+        ))
+
+    def prefix_search(self, prefix):
+        prefix = prefix.lower()
+        return set().union(*(
+            rows for ligature, rows in self.rows_by_ligature.items()
+            if ligature and ligature.lower().startswith(prefix)
+        ))
+
+
+# filters of the search box, matched on "is:<name>"
+FLAGS = {
+    'unassigned': LigatureIndex.unassigned,
+    'assigned': LigatureIndex.assigned,
+    'conflict': LigatureIndex.conflicts,
+}
+
+
+def search(query, name_index, ligature_index):
+    """Rows matching all terms of a search box query.
+
+    Terms match glyph names and ligatures, by prefix when shorter than 3
+    characters and by substring otherwise, falling back to a fuzzy match when
+    nothing contains them. "is:unassigned", "is:assigned" and "is:conflict"
+    select by the assigned ligature. Returns None for an empty query.
+    """
+    rows = None
+
+    for term in query.split():
+        if term.lower().startswith('is:'):
+            flag = FLAGS.get(term[3:].lower())
+            if flag is None:
+                raise ValueError('unknown filter: {}'.format(term))
+            matches = flag(ligature_index)
+        elif len(term) < 3:
+            matches = name_index.prefix_search(term) | ligature_index.prefix_search(term)
+        else:
+            matches = name_index.search(term) | ligature_index.search(term)
+            if not matches:
+                matches = name_index.fuzzy_search(term) | ligature_index.fuzzy_search(term)
+
+        rows = matches if rows is None else rows & matches
+        if not rows:
+            break
+
+    return rows
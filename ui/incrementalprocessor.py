@@ -0,0 +1,170 @@
+import logging
+
+from fontTools.ttLib.tables import otTables
+
+from ui.ligaturebuilder import LigatureBuilder
+from ui.tableprocessor import TableFontProcessor
+
+_logger = logging.getLogger(__name__)
+
+
+class IncrementalFontProcessor(TableFontProcessor):
+    """Patches an earlier ligafont output instead of rebuilding it.
+
+    The ligatures already in the output are diffed against the new mapping.
+    Only the LigatureSets whose ligatures changed are replaced, and glyphs,
+    cmap entries and metrics are only added for characters the output does
+    not have yet. All other lookups of the font are kept.
+    """
+    ENGINE = 'incremental'
+
+    def __init__(self, ttf, mapping, **kwargs):
+        self.lookup = None
+        self.previous_mapping = {}
+
+        kwargs['keep_lookups'] = True
+        super(IncrementalFontProcessor, self).__init__(ttf, mapping, **kwargs)
+
+    def prepare(self):
+        self.charmap = {}
+        self.font = self.run_phase('copy', self.copy_font, self.ttf)
+
+        self.lookup, self.previous_mapping = self.run_phase('read ligatures', self.read_ligatures, self.font)
+
+        char_glyphs = self.get_char_glyphs(self.font)
+        self.chars_to_add = [char for char in self.get_chars() if char not in char_glyphs]
+
+        _logger.debug('adding characters: %s', ''.join(self.chars_to_add))
+
+    def process(self):
+        font = self.font
+
+        if self.chars_to_add:
+            self.run_phase('cmap', self.parse_maps, font)
+            self.run_phase('glyphs', self.parse_glyfs, font)
+            self.run_phase('gdef', self.add_gdef, font)
+            self.run_phase('glyph order', self.add_order, font)
+            self.run_phase('hmtx', self.add_to_hmtx, font)
+            self.run_phase('os2', self.update_os2, font)
+
+        self.run_phase('gsub', self.add_ligatures, font)
+
+    @staticmethod
+    def get_char_glyphs(font):
+        """Glyphs an earlier build added for the characters of the ligatures:
+        named after a single character and mapped from its code point.
+        """
+        candidates = [name for name in font.getGlyphOrder() if len(name) == 1]
+        char_glyphs = set()
+
+        for char_map in font['cmap'].tables:
+            cmap = getattr(char_map, 'cmap', None) or {}
+            char_glyphs.update(name for name in candidates if cmap.get(ord(name)) == name)
+        return char_glyphs
+
+    @classmethod
+    def read_ligatures(cls, font):
+        """Find the lookup an earlier ligafont build added to GSUB.
+
+        Returns the lookup and the mapping it implements, or (None, {}) if the
+        font has no such lookup.
+        """
+        if 'GSUB' not in font or not font['GSUB'].table.LookupList:
+            return None, {}
+
+        char_glyphs = cls.get_char_glyphs(font)
+        found = None, {}
+
+        for lookup in font['GSUB'].table.LookupList.Lookup:
+            subtables = cls.get_subtables(lookup)
+            if not subtables or not all(isinstance(subst, otTables.LigatureSubst) for subst in subtables):
+                continue
+
+            mapping = {}
+            for subst in subtables:
+                for start_char, ligatures in subst.ligatures.items():
+                    for ligature in ligatures:
+                        mapping[start_char + ''.join(ligature.Component)] = ligature.LigGlyph
+
+            if mapping and all(char in char_glyphs for key in mapping for char in key):
+                found = lookup, mapping
+
+        return found
+
+    def get_changed_start_chars(self):
+        keys = set(self.mapping) | set(self.previous_mapping)
+
+        return set(
+            key[0] for key in keys
+            if self.mapping.get(key) != self.previous_mapping.get(key)
+        )
+
+    def add_ligatures(self, font):
+        if self.lookup is None:
+            return super(IncrementalFontProcessor, self).add_ligatures(font)
+
+        start_chars = self.get_changed_start_chars()
+        if not start_chars:
+            return
+
+        builder = LigatureBuilder(font.getGlyphOrder())
+        builder.add_mapping(dict(
+            (key, name) for key, name in self.mapping.items() if key[0] in start_chars
+        ))
+        ligature_sets = dict(builder.ligature_sets())
+
+        subtables = self.get_subtables(self.lookup)
+        subtable_by_char = {}
+        split_chars = set()
+        for subst in subtables:
+            for start_char in subst.ligatures:
+                if start_char in subtable_by_char:
+                    split_chars.add(start_char)
+                subtable_by_char[start_char] = subst
+
+        if start_chars & split_chars:
+            # a set split between subtables is laid out again as a whole
+            return self.rebuild_lookup(font)
+
+        touched = []
+        for start_char in sorted(start_chars):
+            subst = subtable_by_char.get(start_char)
+
+            if start_char not in ligature_sets:
+                if subst is not None:
+                    del subst.ligatures[start_char]
+                continue
+
+            if subst is None:
+                subst = subtables[-1]
+
+            subst.ligatures[start_char] = [
+                self.create_ligature(components, name)
+                for components, name in ligature_sets[start_char]
+            ]
+            touched.append(subst)
+
+        if any(self.subtable_size(subst) > LigatureBuilder.MAX_SUBTABLE_SIZE for subst in touched):
+            self.rebuild_lookup(font)
+        else:
+            self.lookup.SubTable = [
+                subst for subst in self.lookup.SubTable
+                if getattr(subst, 'ExtSubTable', subst).ligatures
+            ]
+            self.lookup.SubTableCount = len(self.lookup.SubTable)
+
+    @staticmethod
+    def subtable_size(subst):
+        size = 10
+        for ligatures in subst.ligatures.values():
+            size += 4 + LigatureBuilder.ligature_set_size([
+                (ligature.Component, ligature.LigGlyph) for ligature in ligatures
+            ])
+        return size
+
+    def rebuild_lookup(self, font):
+        self.lookup.SubTable = []
+
+        builder = self.create_ligature_builder(font.getGlyphOrder())
+        for ligature_sets in builder.subtables():
+            self.append_subtable(self.lookup, self.create_subtable(ligature_sets))
@@ -1,12 +1,21 @@
+import functools
 import os
 import tempfile
 
-from PyQt5.QtCore import QObject, pyqtSlot
-from fontTools.ttLib import TTFont
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSlot
 
-from ui.ligatureitem import LigatureItem
+from ui.buildcache import BuildCache
+from ui.buildworker import BuildWorker
+from ui.lazyimport import lazy_import
 from ui.ligaturetablemodel import LigatureTableModel
-from ui.processor import FontProcessor
+from ui.profiles import DEFAULT_PROFILE, get_profile
+from ui.settings import get_font_mapping, get_setting, set_font_mapping
+
+# fontTools and the engines are only needed once a font is opened
+ttLib = lazy_import('fontTools.ttLib')
+engines = lazy_import('ui.engines')
+incrementalprocessor = lazy_import('ui.incrementalprocessor')
+processing = lazy_import('ui.processor')
 
 
 class ItemListController(QObject):
@@ -18,6 +27,21 @@ class ItemListController(QObject):
         self._items = []
 
         self.ttf = None
+        self.filename = None
+        self.font_hash = None
+        # whether the mapping saved for the open font was restored yet
+        self._mapping_restored = False
+        self._hash_worker = None
+
+        # (font hash, output directory, processor class, options, processed
+        # font) of the last build
+        self._last_build = None
+        self._worker = None
+
+        self.cache = BuildCache(
+            get_setting('cache_dir', 'cache'),
+            get_setting('cache_max_bytes', BuildCache.DEFAULT_MAX_BYTES, int),
+        )
 
         self.font_name = None
         self.font_extension = None
@@ -28,13 +52,34 @@ class ItemListController(QObject):
         self._init_table()
 
     def load_file(self, filename):
+        if self.ttf:
+            self.save_font_mapping()
+
+            # the running build still reads the old font
+            self.cancel_build()
+            QThreadPool.globalInstance().waitForDone()
+            self.ttf.close()
+
         split_file = os.path.basename(filename).split('.')
         self.font_name = '.'.join(split_file[:-1])
         self.font_extension = split_file[-1]
 
-        self.ttf = TTFont(filename)
+        # only the tables holding the glyph names are read to fill the table,
+        # everything else is decompiled once processing needs it
+        self.ttf = ttLib.TTFont(filename, lazy=True)
+        self.filename = filename
+        self.font_hash = None
         self._load_items()
 
+    def _get_font_hash(self):
+        if not self.font_hash:
+            self.font_hash = BuildCache.hash_file(self.filename)
+        return self.font_hash
+
+    @staticmethod
+    def _hash_font(filename, progress):
+        return BuildCache.hash_file(filename)
+
     def _init_table(self):
         self.table = self._parent.ui.item_table
 
@@ -43,13 +88,63 @@ class ItemListController(QObject):
 
         self.table.setSortingEnabled(True)
 
+        self._parent.ui.filter_edit.textChanged.connect(self.filter_items)
+
+    @pyqtSlot(str)
+    def filter_items(self, query):
+        try:
+            self.table_model.set_filter(query)
+        except ValueError as e:
+            self._parent.log(e)
+
     def _load_items(self):
         self.table_model.clear()
+        self.table_model.set_names(self.ttf.getGlyphNames())
 
-        for name in self.ttf.getGlyphNames():
-            self.table_model.add(LigatureItem(name, ''))
+        # the saved mapping is looked up by the hash of the font, which is
+        # read on a thread pool thread, as large fonts take a while
+        self._mapping_restored = False
+        self._hash_worker = BuildWorker(functools.partial(self._hash_font, self.filename))
+        self._hash_worker.signals.finished.connect(self._font_hashed)
+        self._hash_worker.signals.failed.connect(self._hash_failed)
+        QThreadPool.globalInstance().start(self._hash_worker)
 
-        self.table_model.restore_mapping()
+    @pyqtSlot(object)
+    def _font_hashed(self, font_hash):
+        # the font may have been opened again meanwhile
+        if not self._hash_worker or self.sender() is not self._hash_worker.signals:
+            return
+
+        self._hash_worker = None
+        self.font_hash = font_hash
+        if not self._mapping_restored:
+            self._restore_font_mapping()
+
+    def _restore_font_mapping(self):
+        # the mapping saved for this font, else the one of the previous font
+        self.table_model.restore_mapping(get_font_mapping(self._get_font_hash()))
+        self._mapping_restored = True
+
+    @pyqtSlot(object)
+    def _hash_failed(self, exc_info):
+        if not self._hash_worker or self.sender() is not self._hash_worker.signals:
+            return
+
+        self._hash_worker = None
+        self._parent.handle_exception(*exc_info)
+
+    def save_font_mapping(self):
+        """Remember the mapping of the open font for the next time it is opened."""
+        # before the saved mapping is restored, the table does not hold it
+        if not self.ttf or not self._mapping_restored:
+            return
+
+        try:
+            mapping = self.table_model.get_mapping()
+        except ReferenceError:
+            # conflicting ligatures, keep the mapping saved before
+            return
+        set_font_mapping(self._get_font_hash(), mapping)
 
     @pyqtSlot()
     def save(self):
@@ -58,11 +153,134 @@ class ItemListController(QObject):
         else:
             self.save_to_dir(self.output_dir)
 
+    @pyqtSlot()
+    def cancel_build(self):
+        if self._worker:
+            self._worker.cancel()
+
+    @staticmethod
+    def _create_processor(processor_class, ttf, font_hash, mapping, directory, options, progress, last_build):
+        # only an output built the same way can be patched
+        if last_build and last_build[:4] == (font_hash, directory, processor_class, options) \
+                and get_setting('incremental', True, bool):
+            return incrementalprocessor.IncrementalFontProcessor(last_build[4], mapping, progress=progress, **options)
+
+        return processor_class(ttf, mapping, progress=progress, **options)
+
     def save_to_dir(self, directory):
+        if self._worker:
+            self._parent.log('a build is already running')
+            return
+
+        if not self._mapping_restored:
+            self._restore_font_mapping()
+
         try:
             mapping = self.table_model.get_mapping()
-            processor = FontProcessor(self.ttf, mapping)
-            processor.save_files(directory, self.font_name)
-            self._parent.log('OK!')
         except ReferenceError as e:
             self._parent.log(e)
+            return
+
+        font_hash = self._get_font_hash()
+        set_font_mapping(font_hash, mapping)
+
+        processor_class = engines.get_processor_class(get_setting('engine'))
+        profile = get_setting('profile', DEFAULT_PROFILE)
+        formats = get_setting('formats')
+        extensions = processing.parse_extensions(formats) if formats else get_profile(profile).extensions
+        options = {
+            'deterministic': get_setting('deterministic_codes', False, bool),
+        }
+        if get_setting('keep_lookups', False, bool):
+            options['keep_lookups'] = True
+        if get_setting('passthrough', False, bool):
+            options['passthrough'] = True
+        if get_setting('hashed_names', False, bool):
+            options['hashed_names'] = True
+        if get_setting('subset', False, bool):
+            options['subset'] = True
+        if profile != DEFAULT_PROFILE:
+            options['profile'] = profile
+
+        # the build works on its own copy of the mapping, so the table stays
+        # editable while it runs, and gets everything else it reads from the
+        # controller bound here, on the GUI thread
+        self._worker = BuildWorker(functools.partial(
+            self._build, processor_class, self.ttf, self.font_name, font_hash, dict(mapping), directory,
+            extensions, options, self._last_build
+        ))
+        self._worker.signals.progress.connect(self._build_progress)
+        self._worker.signals.finished.connect(self._build_finished)
+        self._worker.signals.failed.connect(self._build_failed)
+        self._worker.signals.cancelled.connect(self._build_cancelled)
+
+        self._set_building(True)
+        QThreadPool.globalInstance().start(self._worker)
+
+    def _build(self, processor_class, ttf, font_name, font_hash, mapping, directory, extensions, options,
+               last_build, progress):
+        """Run a build, on a thread pool thread.
+
+        Returns the message to log and the new last build.
+        """
+        key = BuildCache.make_key(
+            font_hash,
+            mapping,
+            font_name,
+            extensions,
+            processor_class.VERSION,
+            engine=processor_class.ENGINE,
+            **options
+        )
+        if self.cache.fetch(key, directory) is not None:
+            return 'OK! (cached: {hits} hits, {misses} misses, {bytes_saved} bytes saved)'.format(
+                **self.cache.stats()
+            ), last_build
+
+        processor = self._create_processor(
+            processor_class, ttf, font_hash, mapping, directory, options, progress, last_build
+        )
+        filenames = processor.save_files(directory, font_name, extensions)
+
+        if isinstance(processor, incrementalprocessor.IncrementalFontProcessor):
+            message = 'OK! (incremental)'
+        else:
+            # patched outputs depend on the earlier build, only full builds are cached
+            self.cache.store(key, directory, filenames)
+            message = 'OK!'
+
+        if processor.subset:
+            message += ' ({})'.format(processing.format_sizes(processor.sizes))
+
+        font = getattr(processor, 'font', None)
+        return message, (font_hash, directory, processor_class, options, font) if font else None
+
+    def _set_building(self, building):
+        if not building:
+            self._worker = None
+
+        self._parent.ui.save_button.setEnabled(not building)
+        self._parent.ui.cancel_button.setEnabled(building)
+
+    @pyqtSlot(str)
+    def _build_progress(self, phase):
+        self._parent.log('building: {}'.format(phase))
+
+    @pyqtSlot(object)
+    def _build_finished(self, result):
+        message, self._last_build = result
+        self._set_building(False)
+        self._parent.log(message)
+
+    @pyqtSlot(object)
+    def _build_failed(self, exc_info):
+        # an incremental build may have left the font half patched
+        self._last_build = None
+        self._set_building(False)
+        self._parent.handle_exception(*exc_info)
+
+    @pyqtSlot()
+    def _build_cancelled(self):
+        self._last_build = None
+        self._set_building(False)
+        self._parent.log('build cancelled')
@@ -0,0 +1,20 @@
+import importlib
+
+
+class LazyModule(object):
+    """Stands in for a module that is imported when one of its attributes is
+    first used, to keep heavy imports out of the application start.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name):
+    return LazyModule(name)
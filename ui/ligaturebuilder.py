@@ -0,0 +1,108 @@
+class LigatureBuilder(object):
+    """Collects ligatures in a prefix trie keyed by their first glyph and lays
+    them out as LigatureSubst subtables.
+
+    Ligature sets are emitted in glyph ID order as the coverage table requires,
+    and the ligatures of a set longest first, so shaping picks the longest
+    match. Sets are spread over several subtables once a subtable would
+    outgrow its 16 bit offsets, and so are the ligatures of a set that does
+    not fit in a subtable on its own.
+    """
+    MAX_SUBTABLE_SIZE = 0xFFFF
+    # format, coverage offset, set count and the coverage header
+    SUBTABLE_HEADER_SIZE = 10
+
+    # terminal marker in the trie, never a glyph name
+    _GLYPH = None
+
+    def __init__(self, glyph_order):
+        self._glyph_ids = dict((name, index) for index, name in enumerate(glyph_order))
+        self._trie = {}
+
+    def add(self, components, glyph):
+        node = self._trie
+        for component in components:
+            node = node.setdefault(component, {})
+        node[self._GLYPH] = glyph
+
+    def add_mapping(self, mapping):
+        for key, glyph in mapping.items():
+            self.add(list(key), glyph)
+
+    def ligature_sets(self):
+        """Return (first glyph, [(components, glyph), ...]) pairs in glyph ID
+        order, the components excluding the first glyph.
+        """
+        ligature_sets = []
+
+        for first in sorted(self._trie, key=self._glyph_ids.__getitem__):
+            ligatures = []
+            self._collect(self._trie[first], [], ligatures)
+
+            ligatures.sort(key=lambda ligature: (-len(ligature[0]), ligature[0]))
+            ligature_sets.append((first, ligatures))
+
+        return ligature_sets
+
+    def _collect(self, node, prefix, ligatures):
+        for component, child in node.items():
+            if component is self._GLYPH:
+                ligatures.append((list(prefix), child))
+            else:
+                prefix.append(component)
+                self._collect(child, prefix, ligatures)
+                prefix.pop()
+
+    def subtables(self):
+        """Split the ligature sets into the lists of sets of each subtable.
+
+        A set too large for a subtable of its own is split between
+        consecutive subtables, its longest ligatures in the first, so the
+        lookup still tries them longest first.
+        """
+        subtables = []
+        current = []
+        size = self.SUBTABLE_HEADER_SIZE
+
+        for first, ligatures in self.ligature_sets():
+            # set offset and coverage glyph in the subtable itself
+            set_size = 4 + self.ligature_set_size(ligatures)
+
+            if current and size + set_size > self.MAX_SUBTABLE_SIZE:
+                subtables.append(current)
+                current = []
+                size = self.SUBTABLE_HEADER_SIZE
+
+            if size + set_size <= self.MAX_SUBTABLE_SIZE:
+                current.append((first, ligatures))
+                size += set_size
+                continue
+
+            part = []
+            size += 6
+            for ligature in ligatures:
+                ligature_size = self.ligature_size(ligature[0])
+
+                if part and size + ligature_size > self.MAX_SUBTABLE_SIZE:
+                    subtables.append([(first, part)])
+                    part = []
+                    size = self.SUBTABLE_HEADER_SIZE + 6
+
+                part.append(ligature)
+                size += ligature_size
+
+            current.append((first, part))
+
+        if current:
+            subtables.append(current)
+        return subtables
+
+    @staticmethod
+    def ligature_size(components):
+        # offset in the set, then glyph, component count and components
+        return 6 + 2 * len(components)
+
+    @classmethod
+    def ligature_set_size(cls, ligatures):
+        # ligature count, then the offset and the ligature of each
+        return 2 + sum(cls.ligature_size(components) for components, _ in ligatures)
@@ -1,11 +1,15 @@
-from PyQt5.QtCore import QObject
+import sys
 
 
-class LigatureItem(QObject):
+class LigatureItem(object):
+    """A single (glyph name, ligature) row handed to LigatureTableModel.
 
-    def __init__(self, name, ligature, parent=None):
-        super(LigatureItem, self).__init__(parent)
-        self.data = [name, ligature]
+    The model itself keeps its rows in columns, items only carry them in.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, name, ligature):
+        self.data = [sys.intern(name), ligature]
 
     def get(self, index):
         return self.data[index]
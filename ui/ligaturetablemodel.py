@@ -1,19 +1,82 @@
-from PyQt5.QtCore import QAbstractTableModel, QVariant
+import re
+import sys
+from bisect import bisect_left, insort
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QVariant
 from PyQt5.QtCore import Qt
 
+from ui.glyphindex import LigatureIndex, NameIndex, search
 from ui.ligatureitem import LigatureItem
 
 
+def _number_key(match):
+    digits = match.group().lstrip('0') or '0'
+    return chr(len(digits)) + digits
+
+
 class LigatureTableModel(QAbstractTableModel):
+    """Table of glyph names and their ligatures.
+
+    Rows are stored column-wise in two parallel lists of interned glyph names
+    and ligature strings instead of one object per glyph, in the order they
+    were loaded. The view sees them through self.order, which maps view rows
+    to stored rows.
+
+    A sorted list of (sort key, row) pairs is kept per column once it has been
+    sorted by, and updated in place when a ligature is edited, so sorting only
+    has to read the permutation off it. The search indexes of the filter are
+    built on the first query and kept up to date the same way.
+    """
+    # rows handed to the view per fetchMore() call
+    FETCH_BATCH_SIZE = 1000
+
     def __init__(self, rows, headers, parent=None):
         super(LigatureTableModel, self).__init__(parent)
 
-        self.rows = rows
         self.headers = headers
         self._previous_data = None
+        self._sort = None
+        self._filter = ''
+        self._filter_rows = None
+        # (names, row by name, name sort keys, name search index) of the last
+        # glyph set, reused when the same font is loaded again
+        self._name_indexes = None
+        self.names = []
+
+        self._set_columns(
+            [row.get_name() for row in rows],
+            [row.get_ligature() for row in rows],
+        )
+        self._fetched = len(rows)
+
+    @staticmethod
+    def sort_key(value, _digits=re.compile(r'\d+')):
+        """Natural sort key: runs of digits compare as numbers, so uni2 sorts
+        before uni10.
+
+        Each run is prefixed by its length as a control character, which keeps
+        the key a plain string and its comparison in C.
+        """
+        return _digits.sub(_number_key, value)
 
     def rowCount(self, parent=None, *args, **kwargs):
-        return len(self.rows)
+        if parent is not None and parent.isValid():
+            return 0
+        return self._fetched
+
+    def canFetchMore(self, parent=None):
+        if parent is not None and parent.isValid():
+            return False
+        return self._fetched < len(self.order)
+
+    def fetchMore(self, parent=None):
+        count = min(self.FETCH_BATCH_SIZE, len(self.order) - self._fetched)
+        if count <= 0:
+            return
+
+        self.beginInsertRows(QModelIndex(), self._fetched, self._fetched + count - 1)
+        self._fetched += count
+        self.endInsertRows()
 
     def columnCount(self, parent=None, *args, **kwargs):
         return 2
@@ -22,7 +85,7 @@ class LigatureTableModel(QAbstractTableModel):
         if not index.isValid() or role != Qt.DisplayRole:
             return QVariant()
 
-        return QVariant(self.rows[index.row()].get(index.column()))
+        return QVariant(self.columns[index.column()][self.order[index.row()]])
 
     def headerData(self, col, orientation, role=None):
         if orientation == Qt.Horizontal and role == Qt.DisplayRole:
@@ -32,9 +95,124 @@ class LigatureTableModel(QAbstractTableModel):
     def sort(self, column, order=None):
         """Sort table by given column number.
         """
-        self.rows = sorted(self.rows, key=lambda x: x.get(column))
-        if order == Qt.DescendingOrder:
-            self.rows.reverse()
+        self._sort = (column, order)
+
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        rows = [self.order[index.row()] for index in persistent]
+
+        self._update_order()
+
+        if persistent:
+            positions = self._get_positions()
+            self.changePersistentIndexList(persistent, [
+                self.index(positions[row], index.column())
+                for row, index in zip(rows, persistent)
+            ])
+        self.layoutChanged.emit()
+
+    def set_filter(self, query):
+        """Only show the rows matching a search query, see glyphindex.search.
+        """
+        rows = None
+        if query.strip():
+            rows = search(query, self._get_name_index(), self._get_ligature_index())
+            if len(rows) == len(self.names):
+                rows = None
+
+        self.beginResetModel()
+        self._filter = query
+        self._filter_rows = rows
+        self._update_order()
+        self._fetched = min(len(self.order), self.FETCH_BATCH_SIZE)
+        self.endResetModel()
+
+    def _update_order(self):
+        if self._sort is None:
+            order = range(len(self.names))
+        else:
+            column, sort_order = self._sort
+            if self._permutations[column] is None:
+                self._permutations[column] = [row for _, row in self._get_sort_keys(column)]
+
+            order = self._permutations[column]
+            if sort_order == Qt.DescendingOrder:
+                order = order[::-1]
+
+        if self._filter_rows is not None:
+            order = list(filter(self._filter_rows.__contains__, order))
+        self.order = order
+
+    def _get_sort_keys(self, column):
+        if self._sort_keys[column] is not None:
+            return self._sort_keys[column]
+
+        values = self.columns[column]
+        # most ligatures are empty, they sort first and need no key
+        empty = [row for row, value in enumerate(values) if not value]
+        filled = [row for row, value in enumerate(values) if value] if empty else range(len(values))
+
+        sort_key = self.sort_key
+        keys = dict((row, sort_key(values[row])) for row in filled)
+        # sorting the rows by key is stable, so equal keys keep row order
+        self._sort_keys[column] = [('', row) for row in empty] + [
+            (keys[row], row) for row in sorted(filled, key=keys.__getitem__)
+        ]
+        return self._sort_keys[column]
+
+    def _get_positions(self):
+        # rows filtered out stay at -1, an invalid index
+        positions = [-1] * len(self.names)
+        for position, row in enumerate(self.order):
+            positions[row] = position
+        return positions
+
+    def _get_rows_by_name(self):
+        if self._rows_by_name is None:
+            self._rows_by_name = dict((name, row) for row, name in enumerate(self.names))
+        return self._rows_by_name
+
+    def _get_name_index(self):
+        if self._name_index is None:
+            self._name_index = NameIndex(self.names)
+        return self._name_index
+
+    def _get_ligature_index(self):
+        if self._ligature_index is None:
+            self._ligature_index = LigatureIndex(self.ligatures)
+        return self._ligature_index
+
+    def _set_columns(self, names, ligatures):
+        if self.names:
+            self._name_indexes = (self.names, self._rows_by_name, self._sort_keys[0], self._name_index)
+
+        self.names = names
+        self.ligatures = ligatures
+        self.columns = [self.names, self.ligatures]
+
+        self.order = range(len(names))
+        self._rows_by_name = None
+        self._sort_keys = [None, None]
+        self._permutations = [None, None]
+        self._name_index = None
+        self._ligature_index = None
+        self._filter_rows = None
+
+        if names and self._name_indexes and self._name_indexes[0] == names:
+            _, self._rows_by_name, self._sort_keys[0], self._name_index = self._name_indexes
+            self._name_indexes = None
+
+    def _set_value(self, column, row, value):
+        sort_keys = self._sort_keys[column]
+        self._permutations[column] = None
+        if sort_keys is not None:
+            old = (self.sort_key(self.columns[column][row]), row)
+            del sort_keys[bisect_left(sort_keys, old)]
+            insort(sort_keys, (self.sort_key(value), row))
+
+        if column == 1 and self._ligature_index is not None:
+            self._ligature_index.set(row, value)
+        self.columns[column][row] = value
 
     def flags(self, index):
         if index.column() == 1:
@@ -43,38 +221,116 @@ class LigatureTableModel(QAbstractTableModel):
             return Qt.ItemIsEnabled | Qt.ItemIsSelectable
 
     def setData(self, index, data, role=None):
-        self.rows[index.row()].set_ligature(data)
+        self._set_value(1, self.order[index.row()], data)
+        self.dataChanged.emit(index, index)
         return True
 
     def clear(self):
         self._previous_data = self.get_mapping()
-        self.rows = []
-        self.layoutChanged.emit()
 
-    def restore_mapping(self):
-        if not self._previous_data:
+        self.beginResetModel()
+        self._set_columns([], [])
+        self._fetched = 0
+        self.endResetModel()
+
+    def set_items(self, items):
+        """Replace all rows in a single model reset.
+
+        The view is handed the first FETCH_BATCH_SIZE rows, the rest is
+        fetched as it scrolls down.
+        """
+        items = list(items)
+        self.set_rows(
+            [item.get_name() for item in items],
+            [item.get_ligature() for item in items],
+        )
+
+    def set_names(self, names):
+        """Replace all rows by glyphs without ligatures."""
+        names = [sys.intern(name) for name in names]
+        self.set_rows(names, [''] * len(names))
+
+    def set_rows(self, names, ligatures):
+        self.beginResetModel()
+        self._set_columns(names, ligatures)
+        if self._filter.strip():
+            self._filter_rows = search(self._filter, self._get_name_index(), self._get_ligature_index())
+        self._update_order()
+        self._fetched = min(len(self.order), self.FETCH_BATCH_SIZE)
+        self.endResetModel()
+
+    def restore_mapping(self, mapping=None):
+        """Assign the ligatures of mapping to the glyphs of the same name.
+
+        Without a mapping, the ligatures the model held before the last
+        clear() are restored.
+        """
+        if mapping is None:
+            mapping = self._previous_data
+        if not mapping:
             return
 
-        for row in self.rows:
-            name = row.get_name()
+        # cheaper to sort and index the restored ligatures again than to
+        # insert each
+        self._sort_keys[1] = self._permutations[1] = None
+        self._ligature_index = None
 
-            for lig in self._previous_data:
-                if name == self._previous_data[lig]:
-                    row.set_ligature(lig)
-        self.layoutChanged.emit()
+        rows_by_name = self._get_rows_by_name()
+        for lig, name in mapping.items():
+            row = rows_by_name.get(name)
+            if row is not None:
+                self.ligatures[row] = lig
+
+        if self._filter.strip():
+            self.set_filter(self._filter)
+        elif self._sort is not None and self._sort[0] == 1:
+            self.sort(*self._sort)
+        elif self._fetched:
+            self.dataChanged.emit(self.index(0, 1), self.index(self._fetched - 1, 1))
 
     def add(self, item):
         assert isinstance(item, LigatureItem)
 
-        self.rows.append(item)
-        self.layoutChanged.emit()
+        row = len(self.order)
+        if self._fetched < row:
+            # appended behind rows the view has not fetched yet
+            self._append(item)
+            return
+
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._append(item)
+        self._fetched += 1
+        self.endInsertRows()
+
+    def _append(self, item):
+        """Store a row and show it last, whatever the sort order."""
+        row = len(self.names)
+        self.names.append(item.get_name())
+        self.ligatures.append(item.get_ligature())
+
+        if isinstance(self.order, range):
+            self.order = range(row + 1)
+        else:
+            self.order.append(row)
+
+        if self._rows_by_name is not None:
+            self._rows_by_name[item.get_name()] = row
+        if self._name_index is not None:
+            self._name_index.add(row, item.get_name())
+        if self._ligature_index is not None:
+            self._ligature_index.add(row, item.get_ligature())
+        if self._filter_rows is not None:
+            self._filter_rows.add(row)
+        self._permutations = [None, None]
+        for column, sort_keys in enumerate(self._sort_keys):
+            if sort_keys is not None:
+                insort(sort_keys, (self.sort_key(self.columns[column][row]), row))
 
     def get_mapping(self):
         mapping = {}
-        for row in self.rows:
-            lig = row.get_ligature()
+        for name, lig in zip(self.names, self.ligatures):
             if lig and not lig in mapping:
-                mapping[lig] = row.get_name()
+                mapping[lig] = name
             elif lig:
                 raise ReferenceError('{} already assigned'.format(lig))
         return mapping
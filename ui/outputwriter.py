@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import secrets
+
+# hex digits of the content hash put into hashed file names
+HASH_LENGTH = 8
+
+
+def create_temp(filename):
+    """Create a temp file next to filename and return its handle and name.
+
+    Unlike with mkstemp, which makes it readable by the owner only, the file
+    gets the mode the umask gives any new file, as outputs should.
+    """
+    directory, basename = os.path.split(os.path.abspath(filename))
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+
+    while True:
+        tmp_filename = os.path.join(directory, '.{}.{}.tmp'.format(basename, secrets.token_hex(4)))
+        try:
+            return os.open(tmp_filename, flags, 0o666), tmp_filename
+        except FileExistsError:
+            continue
+
+
+def write_temp(filename, chunks):
+    """Write the chunks of bytes to a temp file next to filename.
+
+    Returns the name of the temp file and the size and hash of the content.
+    """
+    handle, tmp_filename = create_temp(filename)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+    return tmp_filename, size, digest.hexdigest()
+
+
+def write_atomic(filename, data):
+    """Write data to a temp file next to filename and rename it into place,
+    so readers never see a partially written file.
+    """
+    tmp_filename = write_temp(filename, [data])[0]
+
+    try:
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+
+
+def hash_data(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(filename):
+    digest = hashlib.sha256()
+
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_if_changed(filename, data):
+    """Write data atomically unless filename already holds the same content,
+    so unchanged outputs keep their mtime.
+
+    Returns whether the file was written.
+    """
+    try:
+        if os.path.getsize(filename) == len(data):
+            with open(filename, 'rb') as file:
+                if hash_data(file.read()) == hash_data(data):
+                    return False
+    except OSError:
+        pass
+
+    write_atomic(filename, data)
+    return True
+
+
+def write_chunks_if_changed(filename, chunks):
+    """Like write_if_changed, for content produced in chunks of bytes that
+    are written as they come instead of being joined in memory first.
+    """
+    tmp_filename, size, digest = write_temp(filename, chunks)
+
+    try:
+        if os.path.getsize(filename) == size and hash_file(filename) == digest:
+            os.unlink(tmp_filename)
+            return False
+    except OSError:
+        pass
+
+    try:
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+    return True
+
+
+def hashed_filename(filename, data):
+    """Insert a hash of data before the extension: icons.ttf becomes
+    icons.1a2b3c4d.ttf.
+    """
+    root, extension = os.path.splitext(filename)
+    return '{}.{}{}'.format(root, hash_data(data)[:HASH_LENGTH], extension)
+
+
+def manifest_filename(font_name):
+    return '{}_manifest.json'.format(font_name)
+
+
+def source_filename(font_name):
+    return '{}_source.json'.format(font_name)
+
+
+def dump_manifest(manifest):
+    """Serialize a manifest of plain to hashed file names, the same way for
+    the same content.
+    """
+    return json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+
+
+def read_manifest(filename):
+    with open(filename, encoding='utf-8') as file:
+        return json.load(file)
@@ -0,0 +1,346 @@
+import hashlib
+import html
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from fontTools.pens.boundsPen import ControlBoundsPen
+from fontTools.pens.svgPathPen import SVGPathPen
+from fontTools.pens.teePen import TeePen
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._g_l_y_f import Glyph
+
+# changes with the way glyphs are rendered, so older cached renders are not used
+RENDER_VERSION = '1'
+
+# pixels of one sprite cell and of the icon in it
+CELL_SIZE = 64
+ICON_SIZE = 48
+PAGE_COLUMNS = 32
+PAGE_ROWS = 32
+
+# fewer glyphs are rendered faster than worker processes start
+PARALLEL_MIN_GLYPHS = 1000
+# glyphs rendered by one task of a worker process
+CHUNK_SIZE = 256
+
+
+def html_filename(font_name):
+    return '{}_preview.html'.format(font_name)
+
+
+def index_filename(font_name):
+    return '{}_preview.json'.format(font_name)
+
+
+def page_filename(font_name, page):
+    return '{}_preview-{}.svg'.format(font_name, page)
+
+
+def cache_filename(font_name):
+    return '{}_preview_cache.json'.format(font_name)
+
+
+def read_cache(filename):
+    """The renders saved by an earlier preview, by outline hash."""
+    try:
+        with open(filename, encoding='utf-8') as file:
+            return dict((key, tuple(value)) for key, value in json.load(file).items())
+    except (IOError, ValueError, AttributeError):
+        return {}
+
+
+def dump_cache(cache):
+    return json.dumps(cache, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def remove_pages(output_dir, font_name, start):
+    """Remove the sprite sheets from page start on, left by an earlier
+    preview of more glyphs.
+    """
+    for page in itertools.count(start):
+        try:
+            os.remove(os.path.join(output_dir, page_filename(font_name, page)))
+        except OSError:
+            return
+
+
+def render_glyph(glyph_set, name):
+    """The SVG path data of a glyph in font units and its horizontal bounds."""
+    path_pen = SVGPathPen(glyph_set)
+    bounds_pen = ControlBoundsPen(glyph_set)
+    glyph_set[name].draw(TeePen(path_pen, bounds_pen))
+
+    x_min, _, x_max, _ = bounds_pen.bounds or (0, 0, 0, 0)
+    return path_pen.getCommands(), x_min, x_max
+
+
+_worker_glyph_set = None
+
+
+def _init_worker(font_data):
+    global _worker_glyph_set
+    _worker_glyph_set = TTFont(BytesIO(font_data)).getGlyphSet()
+
+
+def _render_chunk(names):
+    return [render_glyph(_worker_glyph_set, name) for name in names]
+
+
+class OutlineHasher(object):
+    """Hashes the outlines of glyphs from their binary data, without drawing them.
+
+    TrueType glyphs are hashed with the glyphs they are composed of, CFF
+    glyphs with the subroutines they may call. Glyphs of other outline
+    formats have no hash and are never taken from the cache.
+    """
+
+    def __init__(self, font):
+        self.glyf = font['glyf'] if 'glyf' in font else None
+        self.cff = font['CFF '].cff if 'CFF ' in font else None
+        self._digests = {}
+        self._subrs_digests = {}
+
+    def get_key(self, name):
+        digest = self.get_digest(name)
+        if digest is None:
+            return None
+        return hashlib.sha256((RENDER_VERSION + digest).encode('ascii')).hexdigest()
+
+    def get_digest(self, name):
+        if name not in self._digests:
+            if self.glyf is not None:
+                self._digests[name] = self.hash_glyf(name)
+            elif self.cff is not None:
+                self._digests[name] = self.hash_char_string(name)
+            else:
+                self._digests[name] = None
+        return self._digests[name]
+
+    def hash_glyf(self, name):
+        glyph = self.glyf.glyphs[name]
+        data = getattr(glyph, 'data', None)
+        if data is None:
+            data = glyph.compile(self.glyf, recalcBBoxes=False)
+
+        digest = hashlib.sha256(data)
+        if glyph.isComposite():
+            # the components are referenced by glyph id, their outlines count
+            composite = Glyph(data)
+            composite.expand(self.glyf)
+            for component in composite.components:
+                digest.update(self.get_digest(component.glyphName).encode('ascii'))
+        return digest.hexdigest()
+
+    def hash_char_string(self, name):
+        top_dict = self.cff[self.cff.fontNames[0]]
+        char_string, fd_index = top_dict.CharStrings.getItemAndSelector(name)
+        if char_string.bytecode is None:
+            char_string.compile()
+
+        digest = hashlib.sha256(char_string.bytecode)
+        digest.update(self.get_subrs_digest(top_dict, fd_index).encode('ascii'))
+        return digest.hexdigest()
+
+    def get_subrs_digest(self, top_dict, fd_index):
+        if fd_index not in self._subrs_digests:
+            private = top_dict.FDArray[fd_index].Private if fd_index is not None else top_dict.Private
+
+            digest = hashlib.sha256()
+            for subrs in (self.cff.GlobalSubrs, getattr(private, 'Subrs', [])):
+                digest.update(str(len(subrs)).encode('ascii'))
+                for subr in subrs:
+                    if subr.bytecode is None:
+                        subr.compile()
+                    digest.update(subr.bytecode)
+            self._subrs_digests[fd_index] = digest.hexdigest()
+        return self._subrs_digests[fd_index]
+
+
+class PreviewRenderer(object):
+    """Renders the mapped glyphs of a built font to SVG with the fontTools pens.
+
+    The glyphs are packed in glyph order into sprite sheets of PAGE_COLUMNS
+    by PAGE_ROWS cells. The index maps each glyph to its page, cell and
+    ligatures, so previews can be checked without a browser. The HTML page
+    only shows the sprites and is produced in chunks.
+
+    Renders are taken from the cache when the glyph outline did not change.
+    Glyphs are rendered in the calling process unless workers allows more
+    processes, over which many glyphs left to render are spread then. Only
+    the batch command line does that, a GUI build must not start processes
+    from its worker thread.
+    """
+
+    def __init__(self, font_data, mapping, workers=1):
+        self.font_data = font_data
+        self.font = TTFont(BytesIO(font_data))
+        self.workers = workers
+
+        glyph_ids = self.font.getReverseGlyphMap()
+        self.ligatures = {}
+        for ligature, name in sorted(mapping.items()):
+            if name in glyph_ids:
+                self.ligatures.setdefault(name, []).append(ligature)
+        self.names = sorted(self.ligatures, key=glyph_ids.get)
+
+        hhea = self.font['hhea']
+        self.ascent = hhea.ascent
+        self.em_height = hhea.ascent - hhea.descent
+        if self.em_height <= 0:
+            self.ascent = self.em_height = self.font['head'].unitsPerEm
+
+        # glyph name to (path data, x min, x max)
+        self.renders = {}
+        # outline hash to the render, of the rendered glyphs
+        self.cache = {}
+        self.rendered = 0
+
+    def render(self, cache=None):
+        """Render all glyphs that are not in the cache.
+
+        Afterwards self.cache holds the renders of this preview only, to be
+        saved for the next one.
+        """
+        cache = cache or {}
+        hasher = OutlineHasher(self.font)
+
+        keys = dict((name, hasher.get_key(name)) for name in self.names)
+        todo = [name for name in self.names if keys[name] not in cache]
+
+        self.renders = dict((name, cache[keys[name]]) for name in self.names if keys[name] in cache)
+        self.renders.update(self.render_glyphs(todo))
+        self.rendered = len(todo)
+
+        self.cache = dict(
+            (keys[name], self.renders[name]) for name in self.names if keys[name] is not None
+        )
+
+    def get_workers(self, count):
+        if count < PARALLEL_MIN_GLYPHS:
+            return 1
+        return max(1, min(self.workers, -(-count // CHUNK_SIZE)))
+
+    def render_glyphs(self, names):
+        workers = self.get_workers(len(names))
+
+        if workers == 1:
+            glyph_set = self.font.getGlyphSet()
+            return [(name, render_glyph(glyph_set, name)) for name in names]
+
+        chunks = [names[start:start + CHUNK_SIZE] for start in range(0, len(names), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.font_data,)) as executor:
+            renders = itertools.chain.from_iterable(executor.map(_render_chunk, chunks))
+            return list(zip(names, renders))
+
+    def get_cell(self, index):
+        """The page and the pixel position on it of the index-th glyph."""
+        page, cell = divmod(index, PAGE_COLUMNS * PAGE_ROWS)
+        row, column = divmod(cell, PAGE_COLUMNS)
+        return page, column * CELL_SIZE, row * CELL_SIZE
+
+    def get_page_count(self):
+        return -(-len(self.names) // (PAGE_COLUMNS * PAGE_ROWS))
+
+    def create_pages(self):
+        """Yield the SVG sprite sheets."""
+        per_page = PAGE_COLUMNS * PAGE_ROWS
+        scale = ICON_SIZE / self.em_height
+        padding = (CELL_SIZE - ICON_SIZE) / 2
+
+        for start in range(0, len(self.names), per_page):
+            names = self.names[start:start + per_page]
+            width = CELL_SIZE * min(len(names), PAGE_COLUMNS)
+            height = CELL_SIZE * -(-len(names) // PAGE_COLUMNS)
+
+            lines = [
+                '<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}" viewBox="0 0 {0} {1}">'.format(
+                    width, height
+                ),
+            ]
+            for index, name in enumerate(names, start):
+                path, x_min, x_max = self.renders[name]
+                if not path:
+                    continue
+
+                _, x, y = self.get_cell(index)
+                # the em box is fit into the cell, the outline centered in it
+                dx = x + CELL_SIZE / 2 - scale * (x_min + x_max) / 2
+                dy = y + padding + scale * self.ascent
+                lines.append('<path transform="matrix({0:.6g} 0 0 {1:.6g} {2:.6g} {3:.6g})" d="{4}"/>'.format(
+                    scale, -scale, dx, dy, path
+                ))
+            lines.append('</svg>\n')
+
+            yield '\n'.join(lines).encode('utf-8')
+
+    def create_index(self, font_name):
+        glyphs = {}
+        for index, name in enumerate(self.names):
+            page, x, y = self.get_cell(index)
+            glyphs[name] = {'page': page, 'x': x, 'y': y, 'ligatures': self.ligatures[name]}
+
+        return json.dumps({
+            'cell_size': CELL_SIZE,
+            'columns': PAGE_COLUMNS,
+            'rows': PAGE_ROWS,
+            'pages': [page_filename(font_name, page) for page in range(self.get_page_count())],
+            'glyphs': glyphs,
+        }, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+    def create_html(self, font_name, font_file):
+        """Yield the HTML page in chunks, one per sprite sheet."""
+        styles = ''.join(
+            '.p{} {{ background-image: url("{}"); }}\n'.format(page, html.escape(page_filename(font_name, page)))
+            for page in range(self.get_page_count())
+        )
+
+        yield '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{font_name}</title>
+<style type="text/css">
+@font-face {{
+    font-family: "{font_name}";
+    src: url("{font_file}") format("truetype");
+}}
+.testarea {{
+    font-family: "{font_name}" !important;
+    font-size: 30px;
+}}
+.icon {{
+    display: inline-block;
+    width: {cell}px;
+    height: {cell}px;
+}}
+tbody {{
+    content-visibility: auto;
+}}
+{styles}</style>
+</head>
+<body>
+<table>
+<thead><tr><th>Icon</th><th>Font</th><th>Ligature</th><th>Name</th></tr></thead>
+'''.format(
+            font_name=html.escape(font_name), font_file=html.escape(font_file), cell=CELL_SIZE, styles=styles
+        ).encode('utf-8')
+
+        per_page = PAGE_COLUMNS * PAGE_ROWS
+        for start in range(0, len(self.names), per_page):
+            rows = ['<tbody>']
+            for index, name in enumerate(self.names[start:start + per_page], start):
+                page, x, y = self.get_cell(index)
+                icon = '<i class="icon p{}" style="background-position: -{}px -{}px"></i>'.format(page, x, y)
+
+                for ligature in self.ligatures[name]:
+                    rows.append('<tr><td>{0}</td><td class="testarea">{1}</td><td>{1}</td><td>{2}</td></tr>'.format(
+                        icon, html.escape(ligature), html.escape(name)
+                    ))
+            rows.append('</tbody>\n')
+
+            yield '\n'.join(rows).encode('utf-8')
+
+        yield b'</table>\n</body>\n</html>\n'
@@ -1,125 +1,374 @@
+import logging
 import os
+import shutil
 import tempfile
+import time
+import tracemalloc
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from xml.etree.ElementTree import Element, XML, parse
 
 from fontTools.ttLib import TTFont
 
+from ui.codeallocator import CodePointAllocator, fits_cmap_format
+from ui.fontencoder import encode_woff, encode_woff2
+from ui.ligaturebuilder import LigatureBuilder
+from ui.outputwriter import dump_manifest, hashed_filename, manifest_filename, write_chunks_if_changed, write_if_changed
+from ui.profiles import get_profile
+from ui.preview import (
+    PreviewRenderer, cache_filename, dump_cache, html_filename, index_filename, page_filename, read_cache, remove_pages,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+def parse_extensions(value):
+    """Turn a comma separated list of output formats into a list of extensions."""
+    if not value:
+        return list(FontProcessor.EXTENSIONS)
+
+    extensions = [ext.strip().lower() for ext in value.split(',') if ext.strip()]
+    for extension in extensions:
+        if extension not in FontProcessor.EXTENSIONS:
+            raise ValueError('unknown output format: {}'.format(extension))
+    return extensions
+
+
+def load_font(filename, decompile=True):
+    """Open a font, with all its tables decompiled unless decompile is false.
+
+    A TTFont only decompiles a table once it is read, so without decompiling
+    the time to load a font would show up in the first phase reading it.
+    """
+    ttf = TTFont(filename, lazy=False if decompile else None)
+    if decompile:
+        for tag in ttf.keys():
+            ttf[tag]
+    return ttf
+
+
+def format_sizes(sizes):
+    """Describe the sizes of a report, with the savings of subsetting."""
+    parts = []
+
+    for extension in FontProcessor.EXTENSIONS:
+        if extension not in sizes:
+            continue
+
+        size = sizes[extension]
+        if 'full_size' in size:
+            parts.append('{} {} -> {} bytes ({:+.0%})'.format(
+                extension, size['full_size'], size['size'], size['size'] / size['full_size'] - 1
+            ))
+        else:
+            parts.append('{} {} bytes'.format(extension, size['size']))
+    return ', '.join(parts)
+
 
 class FontProcessor(object):
+    """Adds the ligatures of a mapping to a font by editing its TTX XML dump.
+
+    Every phase of a build is timed: wall and CPU time, and the peak of the
+    memory allocated during the phase while tracemalloc is tracing. The
+    records are collected in get_report(), logged and passed to the optional
+    hook.
+
+    The XML dumps live in a private temporary directory, so any number of
+    builds can run at once as long as each has its own TTFont. It is removed
+    once the files are saved, when the build fails or at the latest when the
+    processor is garbage collected.
+
+    Outputs are only written when their content changed, so unchanged files
+    keep their mtime. With hashed_names, font files are named after a hash of
+    their content and <font_name>_manifest.json maps the plain names to them.
+
+    The build profile names the formats written when save_files() is not
+    given any, and how hard they are compressed.
+
+    With subset, the saved fonts only keep the mapped glyphs and the glyphs of
+    the characters their ligatures are made of. The report then has the size
+    each format would have had without subsetting.
+
+    The preview is rendered in the calling process, or by up to
+    preview_workers processes.
+    """
+    ENGINE = 'xml'
+    VERSION = '3'
     EXTENSIONS = ['ttf', 'woff', 'woff2']
-    USE_TMP = False
 
-    def __init__(self, ttf, mapping):
+    def __init__(self, ttf, mapping, deterministic=False, hashed_names=False, subset=False, profile=None,
+                 preview_workers=1, progress=None, hook=None):
         self.ttf = ttf
         self.mapping = mapping
-
+        self.deterministic = deterministic
+        self.hashed_names = hashed_names
+        self.subset = subset
+        self.profile = get_profile(profile)
+        self.preview_workers = preview_workers
+        # called with the name of each phase before it runs, may raise to
+        # abort the build
+        self.progress = progress
+        # called with the record of each phase after it ran
+        self.hook = hook
+        self.phases = []
+        # outputs that already held the same content and were not written
+        self.unchanged = []
+        # the unflavored binary of the last saved font, before subsetting
+        self.output_data = None
+        # extension to the size of the saved font, and with subset, the size
+        # without subsetting
+        self.sizes = {}
+
+        self.workspace = None
+        self._remove_workspace = None
         self.xml_file = None
         self.xml_out_file = None
 
         self.charmap = {}
         self.chars_to_add = []
         self.glyph_by_name = {}
+        self.allocator = None
+
+        try:
+            self.prepare()
+            self.process()
+        except BaseException:
+            self.cleanup()
+            raise
 
-        self.prepare()
-        self.process()
+    def create_workspace(self):
+        self.workspace = tempfile.mkdtemp(prefix='ligafont-')
+        self._remove_workspace = weakref.finalize(self, shutil.rmtree, self.workspace, True)
 
     def prepare(self):
         self.charmap = {}
         self.chars_to_add = self.get_chars()
 
-        tmp1 = tempfile.mktemp(suffix='.xml')
-
-        if self.USE_TMP:
-            tmp2 = tempfile.mktemp(suffix='.xml')
-        else:
-            tmp2 = 'temp/tmp.xml'
-
-        self.xml_file = tmp1
-        self.xml_out_file = tmp2
-
-        self.ttf.saveXML(self.xml_file)
-
-        print(self.chars_to_add)
-
-    def create_preview(self, output_dir, font_name):
-        icon_template = '''<tr><td class="testarea">{ligature}</td><td>{ligature}</td><td>{name}</td></tr>'''
-
-        icons = []
-        for lig in self.mapping:
-            icons.append(icon_template.format(
-                ligature=lig,
-                name=self.mapping[lig],
-            ))
-
-        template = '''
-            <html>
-                <head>
-                    <style type="text/css">
-                        @font-face {{
-                            font-family: "{font_name}";
-                            src: url("{font_name}.ttf") format("truetype");
-                        }}
-
-                        .testarea {{
-                            font-family: "{font_name}" !important;
-                            font-size: 30px;
-                            display: block;
-                        }}
-
-                        .x {{
-                            content: "\e001";
-                        }}
-                    </style>
-                </head>
-                <body>
-                    <table>
-                        <tr>
-                            <th>Icon</th>
-                            <th>Ligature</th>
-                            <th>Name</th>
-                        </tr>
-                        {icons}
-                    </table>
-                </body>
-            </html>
-        '''.format(font_name=font_name, icons=''.join(icons))
-
-        out_filename = '{}/{}_preview.html'.format(output_dir, font_name)
-        with open(out_filename, 'w') as file:
-            file.write(template)
+        self.create_workspace()
+        self.xml_file = os.path.join(self.workspace, 'input.xml')
+        self.xml_out_file = os.path.join(self.workspace, 'output.xml')
+
+        self.run_phase('xml dump', self.ttf.saveXML, self.xml_file)
+
+        _logger.debug('adding characters: %s', ''.join(self.chars_to_add))
+
+    def create_preview(self, output_dir, font_name, font_file):
+        """Render the mapped glyphs of the saved font into sprite sheets with
+        an index and an HTML page showing them.
+        """
+        renderer = PreviewRenderer(self.output_data, self.mapping, self.preview_workers)
+        cache_file = os.path.join(output_dir, cache_filename(font_name))
+        renderer.render(read_cache(cache_file))
+        _logger.debug('%s: preview rendered %d of %d glyphs', self.ENGINE, renderer.rendered, len(renderer.names))
+
+        filenames = []
+        for page, data in enumerate(renderer.create_pages()):
+            filenames.append(page_filename(font_name, page))
+            self.write_output(output_dir, filenames[-1], data)
+        remove_pages(output_dir, font_name, len(filenames))
+
+        filenames.append(index_filename(font_name))
+        self.write_output(output_dir, filenames[-1], renderer.create_index(font_name))
+
+        filenames.append(html_filename(font_name))
+        self.write_output_chunks(output_dir, filenames[-1], renderer.create_html(font_name, font_file))
+
+        # only the renders of this preview are kept
+        write_if_changed(cache_file, dump_cache(renderer.cache))
+        return filenames
+
+    def run_phase(self, name, func, *args):
+        if self.progress:
+            self.progress(name)
+
+        trace_memory = tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.reset_peak()
+            memory = tracemalloc.get_traced_memory()[0]
+
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        result = func(*args)
+
+        record = {
+            'phase': name,
+            'wall': time.perf_counter() - wall,
+            'cpu': time.thread_time() - cpu,
+            'peak_memory': tracemalloc.get_traced_memory()[1] - memory if trace_memory else None,
+        }
+        self.phases.append(record)
+
+        _logger.debug(
+            '%s: %s wall=%.3fs cpu=%.3fs%s', self.ENGINE, name, record['wall'], record['cpu'],
+            ' peak=%.1fKiB' % (record['peak_memory'] / 1024) if trace_memory else '',
+        )
+        if self.hook:
+            self.hook(record)
+        return result
+
+    def get_report(self):
+        """The records of all phases run so far, JSON serializable."""
+        memory = [record['peak_memory'] for record in self.phases if record['peak_memory'] is not None]
+
+        return {
+            'engine': self.ENGINE,
+            'phases': list(self.phases),
+            'wall': sum(record['wall'] for record in self.phases),
+            'cpu': sum(record['cpu'] for record in self.phases),
+            'peak_memory': max(memory) if memory else None,
+            'unchanged': sorted(self.unchanged),
+            'sizes': dict(self.sizes),
+        }
 
     def process(self):
 
-        xml_file = parse(self.xml_file)
+        xml_file = self.run_phase('xml parse', parse, self.xml_file)
         root = xml_file.getroot()
 
-        self.parse_maps(root)
-        self.parse_glyfs(root)
-        self.add_gdef(root)
-        self.add_order(root)
-        self.add_to_hmtx(root)
-        self.add_gpos(root)
-        self.add_ligatures(root)
-
-        xml_file.write(self.xml_out_file)
-
-    def save_files(self, output_dir, font_name):
+        self.run_phase('cmap', self.parse_maps, root)
+        self.run_phase('glyphs', self.parse_glyfs, root)
+        self.run_phase('gdef', self.add_gdef, root)
+        self.run_phase('glyph order', self.add_order, root)
+        self.run_phase('hmtx', self.add_to_hmtx, root)
+        self.run_phase('gpos', self.add_gpos, root)
+        self.run_phase('gsub', self.add_ligatures, root)
+
+        self.run_phase('xml write', xml_file.write, self.xml_out_file)
+
+    def save_files(self, output_dir, font_name, extensions=None):
+        if extensions is None:
+            extensions = self.profile.extensions
+
+        try:
+            data = self.run_phase('compile', lambda: self.compile_font(self.get_output_font()))
+        finally:
+            self.cleanup()
+        self.output_data = data
+
+        full_data = None
+        if self.subset:
+            full_data = data
+            data = self.run_phase('subset', self.subset_font, data)
+
+        # phases running at the same time would share their memory peaks
+        workers = 1 if tracemalloc.is_tracing() else max(len(extensions), 1)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            jobs = [
+                executor.submit(
+                    self.run_phase, extension, self.save_file, data, output_dir, font_name, extension, full_data
+                )
+                for extension in extensions
+            ]
+            filenames = [job.result() for job in jobs]
+
+        manifest = dict(
+            ('{}.{}'.format(font_name, extension), filename)
+            for extension, filename in zip(extensions, filenames)
+        )
+        font_file = manifest.get('{}.ttf'.format(font_name), '{}.ttf'.format(font_name))
+
+        filenames.extend(self.run_phase('preview', self.create_preview, output_dir, font_name, font_file))
+        if self.hashed_names:
+            filenames.append(self.run_phase('manifest', self.save_manifest, output_dir, font_name, manifest))
+
+        if self.unchanged:
+            _logger.debug('%s: unchanged, not written: %s', self.ENGINE, ', '.join(sorted(self.unchanged)))
+        return filenames
+
+    def get_output_font(self):
         ttf = TTFont()
         ttf.importXML(self.xml_out_file)
+        return ttf
 
-        for extension in self.EXTENSIONS:
-            out_filename = '{}/{}.{}'.format(output_dir, font_name, extension)
-            ttf.save(out_filename)
-
-        self.create_preview(output_dir, font_name)
+    @staticmethod
+    def compile_font(ttf):
+        """Compile all tables once into an unflavored sfnt binary.
+
+        The modification time in 'head' is kept from the input font, so the
+        same build gives the same bytes.
+        """
+        ttf.flavor = None
+        ttf.recalcTimestamp = False
+
+        buffer = BytesIO()
+        ttf.save(buffer)
+        return buffer.getvalue()
+
+    def subset_font(self, data):
+        """Drop all glyphs but the mapped ones and the glyphs of the ligature
+        characters, with the cmap entries, lookups and names of the others.
+        """
+        # only builds that subset need the subsetter
+        from fontTools import subset
+
+        # the subsetter logs every step and glyph list at INFO
+        logging.getLogger(subset.__name__).setLevel(logging.WARNING)
+
+        options = subset.Options(
+            layout_features=['*'],
+            name_IDs=['*'],
+            name_languages=['*'],
+            name_legacy=True,
+            legacy_cmap=True,
+            symbol_cmap=True,
+            glyph_names=True,
+            notdef_outline=True,
+        )
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(glyphs=set(self.mapping.values()), unicodes=[ord(char) for char in self.get_chars()])
+
+        ttf = TTFont(BytesIO(data), recalcTimestamp=False)
+        subsetter.subset(ttf)
+        # all tables changed, none can be passed through
+        return FontProcessor.compile_font(ttf)
+
+    def save_file(self, data, output_dir, font_name, extension, full_data=None):
+        data = self.encode_font(data, extension, self.profile)
+
+        self.sizes[extension] = {'size': len(data)}
+        if full_data is not None:
+            self.sizes[extension]['full_size'] = len(self.encode_font(full_data, extension, self.profile))
+
+        out_filename = '{}.{}'.format(font_name, extension)
+        if self.hashed_names:
+            out_filename = hashed_filename(out_filename, data)
+
+        self.write_output(output_dir, out_filename, data)
+        return out_filename
+
+    def save_manifest(self, output_dir, font_name, manifest):
+        out_filename = manifest_filename(font_name)
+        self.write_output(output_dir, out_filename, dump_manifest(manifest))
+        return out_filename
+
+    def write_output(self, output_dir, filename, data):
+        if not write_if_changed(os.path.join(output_dir, filename), data):
+            self.unchanged.append(filename)
+
+    def write_output_chunks(self, output_dir, filename, chunks):
+        if not write_chunks_if_changed(os.path.join(output_dir, filename), chunks):
+            self.unchanged.append(filename)
 
-        self.cleanup()
+    @staticmethod
+    def encode_font(data, extension, profile=None):
+        """Wrap the compiled sfnt binary in the container of the given extension,
+        compressed as the profile says.
+        """
+        if profile is None:
+            profile = get_profile()
+
+        if extension == 'woff':
+            return encode_woff(data, profile)
+        if extension == 'woff2':
+            return encode_woff2(data, profile)
+        return data
 
     def cleanup(self):
-        if self.xml_file:
-            os.unlink(self.xml_file)
-        if self.xml_out_file and not self.USE_TMP:
-            os.unlink(self.xml_out_file)
+        """Remove the workspace, the XML output can not be saved afterwards."""
+        if self._remove_workspace:
+            self._remove_workspace()
 
     def get_chars(self):
         chars = set()
@@ -127,7 +376,7 @@ class FontProcessor(object):
         for key in self.mapping.keys():
             chars = chars.union(list(key))
 
-        return list(chars)
+        return sorted(chars)
 
     def add_gdef(self, element):
         gdef = element.find('GDEF/GlyphClassDef')
@@ -212,27 +461,33 @@ class FontProcessor(object):
 
     def add_ligatures(self, element):
         sub = self.get_or_create_gsub(element)
-        ligature_root = sub.find('LookupList/Lookup/LigatureSubst')
+        lookup = sub.find('LookupList/Lookup')
 
-        liga_keys = list(self.mapping.keys())
-        used_chars = []
+        glyph_order = [el.attrib['name'] for el in element.find('GlyphOrder').findall('GlyphID')]
+        builder = self.create_ligature_builder(glyph_order)
 
-        current_record = None
-        for key in sorted(liga_keys, reverse=True):
-            start_char = key[0]
+        for index, ligature_sets in enumerate(builder.subtables()):
+            ligature_root = Element('LigatureSubst', attrib={
+                'index': '{}'.format(index),
+                'Format': '1',
+            })
+            lookup.append(ligature_root)
 
-            if start_char not in used_chars:
-                current_record = self.create_liga_record(start_char, ligature_root)
-                used_chars.append(start_char)
+            for start_char, ligatures in ligature_sets:
+                record = self.create_liga_record(start_char, ligature_root)
 
-            self.add_ligature(current_record, key)
+                for components, name in ligatures:
+                    self.add_ligature(record, components, name)
 
-    def add_ligature(self, record, key):
-        component_str = ','.join(key[1:])
-        name = self.mapping[key]
+    def create_ligature_builder(self, glyph_order):
+        builder = LigatureBuilder(glyph_order)
+        builder.add_mapping(self.mapping)
+        return builder
 
+    @staticmethod
+    def add_ligature(record, components, name):
         el = Element('Ligature', attrib={
-            'components': component_str,
+            'components': ','.join(components),
             'glyph': name,
         })
         record.append(el)
@@ -293,7 +548,6 @@ class FontProcessor(object):
                 <Lookup index="0">
                     <LookupType value="4"></LookupType>
                     <LookupFlag value="0"></LookupFlag>
-                    <LigatureSubst index="0" Format="1"></LigatureSubst>
                 </Lookup>
             </LookupList>
         ''')
@@ -305,40 +559,69 @@ class FontProcessor(object):
         return sub
 
     def parse_maps(self, element):
+        char_maps = []
         for char_map in element.find('cmap'):
-            if 'cmap_format_' in char_map.tag:
-                self.parse_map(char_map)
+            cmap_format = char_map.tag[len('cmap_format_'):]
+
+            # format 14 holds variation sequences, not a code point map
+            if char_map.tag.startswith('cmap_format_') and cmap_format.isdigit() and cmap_format != '14':
+                char_maps.append(char_map)
+
+        self.allocator = self.create_allocator(
+            int(mapping.attrib['code'], 16)
+            for char_map in char_maps
+            for mapping in char_map.findall('map')
+        )
+
+        for char_map in char_maps:
+            self.parse_map(char_map)
+
+    def create_allocator(self, used_codes):
+        allocator = CodePointAllocator(used_codes, self.deterministic)
 
-    def parse_map(self, char_map):
         for char in self.chars_to_add:
-            char_code = '{}'.format(hex(ord(char)))
+            allocator.reserve(ord(char))
+        return allocator
 
-            for mapping in char_map.findall('map'):
-                mapping_code = '{}'.format(mapping.attrib['code'])
+    def parse_map(self, char_map):
+        cmap_format = int(char_map.tag[len('cmap_format_'):])
+        index = self.index_map(char_map)
+
+        for char in self.chars_to_add:
+            char_code = ord(char)
 
-                if mapping_code == char_code:
-                    if mapping_code not in self.charmap:
-                        self.charmap[mapping_code] = self.get_new_char_code()
+            for mapping in index.pop(char_code, []):
+                if char_code not in self.charmap:
+                    self.charmap[char_code] = self.allocator.allocate(char_code)
+                new_code = self.charmap[char_code]
 
-                    if char_map.tag == 'cmap_format_0':
-                        char_map.remove(mapping)
-                    else:
-                        mapping.attrib['code'] = self.charmap[mapping_code]
+                if fits_cmap_format(new_code, cmap_format):
+                    mapping.attrib['code'] = hex(new_code)
+                    index.setdefault(new_code, []).append(mapping)
+                else:
+                    char_map.remove(mapping)
 
             char_element = Element('map', attrib={
-                'code': char_code,
+                'code': hex(char_code),
                 'name': char,
             })
             char_map.append(char_element)
+            index[char_code] = [char_element]
 
         for mapping in char_map.findall('map'):
             code = mapping.attrib['code']
             name = mapping.attrib['name']
             self.glyph_by_name[name] = code
 
-    def get_new_char_code(self):
-        code = len(self.charmap) + 1
-        return "0xe%03d" % (code,)
+    @staticmethod
+    def index_map(char_map):
+        """Index the map entries of a cmap subtable by their code point, so each
+        character is looked up once instead of scanning the whole subtable.
+        """
+        index = {}
+        for mapping in char_map.findall('map'):
+            index.setdefault(int(mapping.attrib['code'], 16), []).append(mapping)
+        return index
 
     def add_order(self, element):
         order_element = element.find('GlyphOrder')
@@ -383,7 +666,7 @@ class FontProcessor(object):
     def parse_ccf(self, element):
         glyf_element = element.find('CFF/CFFFont/CharStrings')
         if not glyf_element:
-            print('no cff')
+            _logger.debug('no CFF table')
             return False
 
         for char in self.chars_to_add:
@@ -0,0 +1,40 @@
+class BuildProfile(object):
+    """The formats a build writes unless told otherwise, and how hard they
+    are compressed.
+
+    WOFF tables are compressed with zlib at zlib_level, or with zopfli at the
+    matching number of iterations if zopfli is set and installed. WOFF2
+    stores the tables in woff2_transforms transformed, which makes them
+    smaller but costs time to encode. fontTools always runs Brotli at
+    quality 11, so WOFF2 can not be made faster any other way.
+    """
+
+    def __init__(self, name, extensions, zlib_level=6, zopfli=False, woff2_transforms=('glyf', 'loca')):
+        self.name = name
+        self.extensions = list(extensions)
+        self.zlib_level = zlib_level
+        self.zopfli = zopfli
+        self.woff2_transforms = frozenset(woff2_transforms)
+
+
+PROFILES = dict((profile.name, profile) for profile in [
+    # quick local iterations: browsers and the preview take TTF. Leaving out
+    # the WOFF2 transforms saves little next to Brotli and costs a lot of size
+    BuildProfile('dev', ['ttf'], zlib_level=1),
+    # the fontTools defaults
+    BuildProfile('default', ['ttf', 'woff', 'woff2']),
+    # the smallest files, for shipping
+    BuildProfile('release', ['ttf', 'woff', 'woff2'], zlib_level=9, zopfli=True,
+                 woff2_transforms=('glyf', 'loca', 'hmtx')),
+])
+DEFAULT_PROFILE = 'default'
+
+
+def get_profile(name=None):
+    if not name:
+        name = DEFAULT_PROFILE
+
+    if name not in PROFILES:
+        raise ValueError('unknown build profile: {}'.format(name))
+
+    return PROFILES[name]
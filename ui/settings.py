@@ -1,26 +1,144 @@
+import atexit
+import json
+import threading
+
 from PyQt5.QtCore import QSettings
 
+SETTINGS_FILE = 'settings.ini'
+# seconds without further changes before changes are written
+FLUSH_DELAY = 1.0
+# fonts whose mapping is remembered, the least recently saved are dropped
+MAX_FONT_MAPPINGS = 20
+
+
+def convert(value, s_type):
+    """Convert a value read from the INI file, where everything is a string."""
+    if isinstance(value, s_type):
+        return value
+    if s_type is bool and isinstance(value, str):
+        return value.lower() in ('true', '1')
+    return s_type(value)
+
+
+class SettingsStore(object):
+    """Keeps the settings of an INI file in memory.
+
+    The file is read once, on first use. Changes are collected and written
+    in one batch once no further change came for flush_delay seconds, on
+    flush() and when the interpreter exits. All methods may be called from
+    any thread.
+    """
+
+    def __init__(self, filename, flush_delay=FLUSH_DELAY):
+        self.filename = filename
+        self.flush_delay = flush_delay
+
+        self._lock = threading.RLock()
+        self._values = None
+        # key to new value of the changes not written yet, None removes the key
+        self._changes = {}
+        self._timer = None
+
+    def _open(self):
+        settings = QSettings(self.filename, QSettings.IniFormat)
+        settings.setFallbacksEnabled(False)
+        return settings
+
+    def _get_values(self):
+        if self._values is None:
+            settings = self._open()
+            self._values = dict((key, settings.value(key)) for key in settings.allKeys())
+        return self._values
+
+    def get(self, key, default_value=None, s_type=str):
+        with self._lock:
+            value = self._get_values().get(key)
+
+        if value is None:
+            return default_value
+        return convert(value, s_type)
+
+    def set(self, key, value):
+        with self._lock:
+            self._get_values()[key] = value
+            self._changes[key] = value
+            self._schedule_flush()
+
+    def remove(self, key):
+        with self._lock:
+            self._get_values().pop(key, None)
+            self._changes[key] = None
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._timer:
+            self._timer.cancel()
+
+        self._timer = threading.Timer(self.flush_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """Write the pending changes now."""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+            changes, self._changes = self._changes, {}
+            if not changes:
+                return
+
+            settings = self._open()
+            for key, value in changes.items():
+                if value is None:
+                    settings.remove(key)
+                else:
+                    settings.setValue(key, value)
+            settings.sync()
+
+    def reload(self):
+        """Write the pending changes and read the file again on next use."""
+        with self._lock:
+            self.flush()
+            self._values = None
+
+
+_store = SettingsStore(SETTINGS_FILE)
+atexit.register(_store.flush)
+
 
 def reload_settings():
-    global settings
-    if settings:
-        del settings
+    _store.reload()
+
 
-    settings = QSettings('settings.ini', QSettings.IniFormat)
-    settings.setFallbacksEnabled(False)
+def flush_settings():
+    _store.flush()
 
 
 def set_setting(key, value):
-    settings.setValue(key, value)
-    reload_settings()
+    _store.set(key, value)
 
 
 def get_setting(key, default_value=None, s_type=None):
     if not s_type:
         s_type = str
 
-    val = settings.value(key, default_value, type=s_type)
-    return val
+    return _store.get(key, default_value, s_type)
+
+
+def get_font_mapping(font_hash):
+    """The mapping last saved for the font with the given hash, or None."""
+    value = get_setting('font_mappings/' + font_hash)
+    return json.loads(value) if value else None
+
+
+def set_font_mapping(font_hash, mapping):
+    recent = [key for key in json.loads(get_setting('font_mappings_recent', '[]')) if key != font_hash]
+    recent.append(font_hash)
+
+    for key in recent[:-MAX_FONT_MAPPINGS]:
+        _store.remove('font_mappings/' + key)
 
-settings = None
-reload_settings()
+    set_setting('font_mappings/' + font_hash, json.dumps(mapping, ensure_ascii=False, sort_keys=True))
+    set_setting('font_mappings_recent', json.dumps(recent[-MAX_FONT_MAPPINGS:]))
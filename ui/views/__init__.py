@@ -1,26 +1,78 @@
+import hashlib
+import io
 import os
 import sys
 
-from PyQt5.uic import compileUi
+from ui.outputwriter import write_atomic
+
+# first line of a compiled view, records the .ui file it was compiled from
+HASH_PREFIX = '# ui sha256: '
+
+
+def hash_ui_file(file_name):
+    with open(file_name, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def read_ui_hash(py_file_name):
+    try:
+        with open(py_file_name, encoding='utf-8') as file:
+            line = file.readline()
+    except OSError:
+        return None
+
+    if not line.startswith(HASH_PREFIX):
+        return None
+    return line[len(HASH_PREFIX):].strip()
 
 
 def compile_ui_file(root_path, file_name):
-    file_name = os.path.join(root_path, file_name)
+    """Compile a .ui file to the .py file next to it, unless that is up to date.
 
-    if file_name.endswith('.pyc'):
-        os.remove(file_name)
+    A .py file newer than its .ui file is taken as up to date without reading
+    either. Otherwise the hash recorded in the .py file is compared with the
+    .ui file, so a fresh checkout or a touched file does not cost a compile.
+    Returns whether the file was compiled.
+    """
+    file_name = os.path.join(root_path, file_name)
     if not file_name.endswith('.ui'):
-        return
+        return False
 
-    py_file_name = file_name.replace('.ui', '.py')
+    py_file_name = file_name[:-len('.ui')] + '.py'
 
-    with open(py_file_name, 'w') as py_file:
-        compileUi(file_name, py_file)
+    try:
+        if os.stat(py_file_name).st_mtime_ns >= os.stat(file_name).st_mtime_ns:
+            return False
+    except OSError:
+        pass
 
+    ui_hash = hash_ui_file(file_name)
+    if read_ui_hash(py_file_name) == ui_hash:
+        # up to date, let the next start take the shortcut above
+        os.utime(py_file_name, None)
+        return False
 
-if not getattr(sys, 'frozen', False):
-    print('compiling ui sources')
-    dir = os.path.dirname(__file__)
-    for root, folders, files in os.walk(dir):
+    # uic is only needed after the .ui file changed
+    from PyQt5.uic import compileUi
+
+    py_file = io.StringIO()
+    py_file.write('{}{}\n'.format(HASH_PREFIX, ui_hash))
+    compileUi(file_name, py_file)
+
+    write_atomic(py_file_name, py_file.getvalue().encode('utf-8'))
+    return True
+
+
+def compile_ui_files(directory):
+    compiled = []
+
+    for root, folders, files in os.walk(directory):
         for file in files:
-            compile_ui_file(root, file)
\ No newline at end of file
+            if compile_ui_file(root, file):
+                compiled.append(file)
+    return compiled
+
+
+if not getattr(sys, 'frozen', False):
+    for file in compile_ui_files(os.path.dirname(__file__)):
+        print('compiled ui source {}'.format(file))
@@ -1,3 +1,4 @@
+# ui sha256: c68dd4ffd991d57fc55412b04196148aea827f5fc3d20615ecdbc1e84cd197c1
 # -*- coding: utf-8 -*-
 
 # Form implementation generated from reading ui file 'D:\Daten\Documents\Projekte\LigaFont\ui\views\mainwindow.ui'
@@ -45,10 +46,21 @@ class Ui_MainWindow(object):
         self.output_dir.setReadOnly(True)
         self.output_dir.setObjectName("output_dir")
         self.horizontalLayout_3.addWidget(self.output_dir)
+        self.profile_box = QtWidgets.QComboBox(self.groupBox_2)
+        self.profile_box.setObjectName("profile_box")
+        self.horizontalLayout_3.addWidget(self.profile_box)
         self.save_button = QtWidgets.QPushButton(self.groupBox_2)
         self.save_button.setObjectName("save_button")
         self.horizontalLayout_3.addWidget(self.save_button)
+        self.cancel_button = QtWidgets.QPushButton(self.groupBox_2)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setObjectName("cancel_button")
+        self.horizontalLayout_3.addWidget(self.cancel_button)
         self.verticalLayout.addWidget(self.groupBox_2)
+        self.filter_edit = QtWidgets.QLineEdit(self.centralwidget)
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.setObjectName("filter_edit")
+        self.verticalLayout.addWidget(self.filter_edit)
         self.item_table = QtWidgets.QTableView(self.centralwidget)
         self.item_table.setObjectName("item_table")
         self.item_table.horizontalHeader().setSortIndicatorShown(True)
@@ -76,5 +88,8 @@ class Ui_MainWindow(object):
         self.groupBox_2.setTitle(_translate("MainWindow", "Output directory"))
         self.output_button.setText(_translate("MainWindow", "..."))
         self.reopen_output.setText(_translate("MainWindow", "<"))
+        self.profile_box.setToolTip(_translate("MainWindow", "Build profile: the output formats and how hard they are compressed"))
         self.save_button.setText(_translate("MainWindow", "Save now!"))
+        self.cancel_button.setText(_translate("MainWindow", "Cancel"))
+        self.filter_edit.setPlaceholderText(_translate("MainWindow", "Filter glyphs, e.g. \"arrow\", \"is:unassigned\" or \"is:conflict\""))
 
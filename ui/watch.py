@@ -0,0 +1,190 @@
+import argparse
+import logging
+import os
+import threading
+import time
+import traceback
+from io import BytesIO
+
+from fontTools.ttLib import TTFont
+
+from ui.batch import add_build_arguments, get_processor_options, load_manifest, load_mapping
+from ui.engines import ENGINES, DEFAULT_ENGINE
+from ui.incrementalprocessor import IncrementalFontProcessor
+from ui.profiles import get_profile
+from ui.tableprocessor import TableFontProcessor
+
+_logger = logging.getLogger(__name__)
+
+# seconds between two looks at the input files
+DEFAULT_INTERVAL = 0.1
+# seconds the input files have to stay unchanged before a rebuild starts
+DEFAULT_DEBOUNCE = 0.25
+
+
+def get_stamp(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class WatchedJob(object):
+    """A batch job whose inputs are kept in memory between builds.
+
+    The source font is read once and only read again when its file changes.
+    A change of the mapping alone patches the previous output with the
+    incremental engine, if the engine is table based, instead of building
+    from the source font again.
+    """
+
+    def __init__(self, job, engine=DEFAULT_ENGINE, extensions=None, **processor_options):
+        self.job = job
+        self.processor_class = ENGINES[engine]
+        self.extensions = extensions or get_profile(processor_options.get('profile')).extensions
+        self.processor_options = processor_options
+
+        self.stamps = None
+        self.font_data = None
+        self.ttf = None
+        self.mapping = None
+        # TTF binary of the last build, the base of the next incremental one
+        self.output_data = None
+
+    def poll(self):
+        """Check the input files, returns whether they changed since the last poll."""
+        stamps = get_stamp(self.job.input_file), get_stamp(self.job.mapping_file)
+        changed = stamps != self.stamps
+        self.stamps = stamps
+        return changed
+
+    def load_font(self):
+        """Read the source font again if its content changed.
+
+        The whole file is read into memory, so a font that is rewritten while
+        tables are still read lazily can not mix two versions.
+        """
+        with open(self.job.input_file, 'rb') as file:
+            data = file.read()
+
+        if data == self.font_data:
+            return False
+
+        if self.ttf:
+            self.ttf.close()
+
+        self.font_data = data
+        self.ttf = TTFont(BytesIO(data))
+        self.output_data = None
+        return True
+
+    def build(self):
+        """Build the job if its font or mapping changed.
+
+        Returns a line describing the outcome, or None if nothing changed.
+        """
+        started = time.perf_counter()
+
+        try:
+            font_changed = self.load_font()
+            mapping = load_mapping(self.job.mapping_file)
+            if not font_changed and mapping == self.mapping:
+                return None
+
+            if not os.path.isdir(self.job.output_dir):
+                os.makedirs(self.job.output_dir)
+
+            if self.output_data is not None:
+                processor = IncrementalFontProcessor(
+                    TTFont(BytesIO(self.output_data)), mapping, **self.processor_options
+                )
+                kind = 'incremental'
+            else:
+                processor = self.processor_class(self.ttf, mapping, **self.processor_options)
+                kind = 'full'
+
+            processor.save_files(self.job.output_dir, self.job.font_name, self.extensions)
+        except Exception as e:
+            _logger.debug(traceback.format_exc())
+            # a broken input usually means an editor is still writing it,
+            # the next change triggers another build
+            return '{:<6} {:<30} {}: {}'.format('FAILED', self.job.font_name, type(e).__name__, e)
+
+        self.mapping = mapping
+        if issubclass(self.processor_class, TableFontProcessor):
+            self.output_data = processor.output_data
+
+        unchanged = len(processor.unchanged)
+        return '{:<6} {:<30} {} build {:.3f}s, {} files unchanged'.format(
+            'OK', self.job.font_name, kind, time.perf_counter() - started, unchanged
+        )
+
+
+def watch(jobs, interval=DEFAULT_INTERVAL, debounce=DEFAULT_DEBOUNCE, stop=None, output=print, **options):
+    """Build all jobs, then rebuild each job whenever its input font or
+    mapping changes, until stop is set.
+
+    A burst of changes causes one rebuild, once the files stayed unchanged
+    for debounce seconds. The options are passed on to WatchedJob.
+    """
+    if stop is None:
+        stop = threading.Event()
+
+    watched = [WatchedJob(job, **options) for job in jobs]
+    # time of the last change of each job waiting for its rebuild
+    pending = {}
+
+    for job in watched:
+        job.poll()
+        pending[job] = 0
+
+    while not stop.is_set():
+        now = time.monotonic()
+
+        for job in watched:
+            if job.poll():
+                pending[job] = now
+
+        for job, changed in list(pending.items()):
+            if now - changed < debounce:
+                continue
+
+            del pending[job]
+            line = job.build()
+            if line:
+                output(line)
+
+        stop.wait(interval)
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='Rebuild icon fonts whenever their font or mapping changes.')
+    add_build_arguments(parser)
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help='seconds between checks of the input files (default: %(default)s)')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help='seconds the inputs have to stay unchanged before a rebuild (default: %(default)s)')
+    return parser
+
+
+def main(argv=None):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    processor_options = get_processor_options(parser, args)
+
+    jobs = load_manifest(args.manifest)
+    print('watching {} jobs, press Ctrl+C to stop'.format(len(jobs)))
+
+    try:
+        watch(
+            jobs,
+            interval=args.interval,
+            debounce=args.debounce,
+            engine=args.engine,
+            extensions=args.formats,
+            **processor_options
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,11 @@
+import sys
+import logging
+
+from ui.watch import main
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+# fontTools logs every table it compiles or subsets at info level
+logging.getLogger('fontTools').setLevel(logging.WARNING)
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))